@@ -2,6 +2,7 @@ DEFAULTS = {
     'MODEL_LIBRARY': '${HOME}/.config/nothingburger/model_library',
     'MODEL_FILE': 'example/neural-chat.toml',
     'BOT_LIBRARY': '${HOME}/.config/roborambo/bot_library',
+    'STATE_LIBRARY': '${HOME}/.config/roborambo/state',
     'API_FORMAT': 'chat',  # Prefer modern chat API format by default
     'TEMPLATE_STYLE': 'chat',  # Use chat-optimized templates by default
 }
\ No newline at end of file
@@ -0,0 +1,128 @@
+import os
+import re
+import queue
+import sqlite3
+import threading
+import multiprocessing.util
+from datetime import datetime
+from . import DEFAULTS
+
+TOKEN = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS turns USING fts5(
+    content,
+    sender UNINDEXED,
+    role UNINDEXED,
+    channel UNINDEXED,
+    source UNINDEXED,
+    timestamp UNINDEXED
+)
+"""
+
+def default_path(bot_name):
+    name = re.sub(r"[^\w.-]+", "_", bot_name).strip("_").lower()
+    return os.path.expandvars(f"{DEFAULTS['STATE_LIBRARY']}/archive/{name}.sqlite3")
+
+class ConversationArchive:
+    """Full-text searchable archive of every conversation turn.
+
+    Appends only enqueue; a background thread writes them to SQLite FTS5 in
+    batches so archiving never sits on the reply path.
+    """
+
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.batch_size = kwargs.get('batch_size', 64)
+        self.flush_interval = kwargs.get('flush_interval', 1.0)
+        self.max_pending = kwargs.get('max_pending', 10000)
+        self.readers = threading.local()
+        self.dropped = 0
+        self.writer = None
+        self.writer_pid = None
+        self.writer_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(SCHEMA)
+
+    def ensure_writer(self):
+        """Start the writer thread lazily, and again in forked children which don't inherit it."""
+        if self.writer_pid == os.getpid():
+            return
+        with self.writer_lock:
+            if self.writer_pid == os.getpid():
+                return
+            self.pending = queue.Queue(maxsize=self.max_pending)
+            self.writer = threading.Thread(target=self.write_loop, daemon=True)
+            self.writer.start()
+            self.writer_pid = os.getpid()
+            # The writer is a daemon thread, so flush before the process goes, including forked workers
+            # that leave through os._exit; ahead of the log listener, which stops at priority 100
+            multiprocessing.util.Finalize(None, self.close, exitpriority=200)
+
+    def append(self, channel, sender, role, content, **kwargs):
+        """Queue a turn for archiving without blocking."""
+        self.ensure_writer()
+        timestamp = kwargs.get('timestamp', datetime.now())
+        try:
+            self.pending.put_nowait((content, sender, role, str(channel), kwargs.get('source', ''), timestamp.isoformat()))
+        except queue.Full:
+            self.dropped += 1
+
+    def write_loop(self):
+        conn = sqlite3.connect(self.path)
+        while True:
+            batch = [self.pending.get()]
+            if batch[0] is None:
+                break
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.pending.get(timeout=self.flush_interval))
+                    if batch[-1] is None:
+                        break
+            except queue.Empty:
+                pass
+
+            stop = batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            with conn:
+                conn.executemany("INSERT INTO turns (content, sender, role, channel, source, timestamp) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            if stop:
+                break
+        conn.close()
+
+    def close(self):
+        """Flush pending turns and stop the writer."""
+        if self.writer_pid != os.getpid():
+            return
+        self.writer_pid = None
+        self.pending.put(None)
+        self.writer.join()
+
+    def reader(self):
+        if not hasattr(self.readers, 'conn'):
+            self.readers.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        return self.readers.conn
+
+    def search(self, query, channel=None, limit=5):
+        """Rank archived turns matching `query`, optionally restricted to one channel."""
+        terms = TOKEN.findall(query)
+        if not terms:
+            return []
+
+        # Quote each term so user text can't be parsed as FTS5 syntax
+        match = " OR ".join('"{}"'.format(term) for term in terms)
+        sql = "SELECT sender, role, channel, timestamp, snippet(turns, 0, '**', '**', '…', 16) FROM turns WHERE turns MATCH ?"
+        params = [match]
+        if channel is not None:
+            sql += " AND channel = ?"
+            params.append(str(channel))
+        sql += " ORDER BY bm25(turns) LIMIT ?"
+        params.append(limit)
+
+        return [
+            {'sender': sender, 'role': role, 'channel': channel, 'timestamp': timestamp, 'snippet': snippet}
+            for sender, role, channel, timestamp, snippet in self.reader().execute(sql, params)
+        ]
\ No newline at end of file
@@ -1,5 +1,9 @@
 import os
 from .chains import RamboChain
+from .chains.router import ToolRouter
+from .quota import QuotaManager
+from .archive import ConversationArchive, default_path as default_archive_path
+from .model_handle import LazyModel
 from nothingburger.model_loader import initializeModel
 import roborambo.tools as tools
 import nothingburger.templates as templates
@@ -7,16 +11,44 @@ from . import DEFAULTS
 
 class Assistant:
     def __init__(self, conf, **kwargs):
+        # Optional pools let several assistants in one process share tool instances and models
+        tool_pool = kwargs.get('tool_pool')
+        model_pool = kwargs.get('model_pool')
+
+        # Tool metadata is read from the classes once, up front
+        self.catalog = tools.get_catalog()
+
         # Initialize tools
         self.active_tools = {}
-        for tool in conf['tools']['enabled']:
-            self.active_tools[tool] = tools.available_tools[tool]()
+        enabled_tools = list(conf['tools']['enabled'])
+        budget_defaults = {}
+        if conf.get('result_budget', {}).get('enabled', False):
+            # Every tool's results are capped, and the model can page through what was cut
+            budget_defaults = {
+                'max_result_tokens': conf['result_budget'].get('max_tokens', 2000),
+                'result_strategy': conf['result_budget'].get('strategy', 'head_tail'),
+            }
+            if 'results' not in enabled_tools:
+                enabled_tools.append('results')
 
-        # Initialize the model
-        model = initializeModel(os.path.expandvars("{}/{}".format(
-            conf.get('tunables', {}).get('model_library', DEFAULTS["MODEL_LIBRARY"]),
-            conf.get('tunables', {}).get('model_file', DEFAULTS["MODEL_FILE"]),
-        )))
+        for tool in enabled_tools:
+            tool_conf = {**budget_defaults, **conf['tools'].get(tool, {})}
+            if tool_pool is None:
+                self.active_tools[tool] = tools.available_tools[tool](**tool_conf)
+            else:
+                # Only share instances between bots that configure the tool identically
+                key = (tool, repr(sorted(tool_conf.items())))
+                if key not in tool_pool:
+                    tool_pool[key] = tools.available_tools[tool](**tool_conf)
+                self.active_tools[tool] = tool_pool[key]
+
+        # Initialize the models: the main one, plus optional cheaper tiers for housekeeping calls
+        tunables = conf.get('tunables', {})
+        model = self.load_model(tunables.get('model_file', DEFAULTS["MODEL_FILE"]), tunables, model_pool)
+        tier_models = {}
+        for tier in ('classifier',):
+            if tunables.get(f'{tier}_model_file'):
+                tier_models[tier] = self.load_model(tunables[f'{tier}_model_file'], tunables, model_pool)
 
         # Use simple chat template - no need for tool instructions since we use function calling
         template = templates.getTemplate("chat_with_context")
@@ -27,13 +59,60 @@ class Assistant:
             **conf['instructions']
         )
 
+        # Long-term conversation archive, searchable through the recall tool
+        self.archive = None
+        if conf.get('archive', {}).get('enabled', False):
+            self.archive = ConversationArchive(
+                os.path.expandvars(conf['archive'].get('path', default_archive_path(conf['name']))),
+                batch_size=conf['archive'].get('batch_size', 64),
+                flush_interval=conf['archive'].get('flush_interval', 1.0),
+            )
+
+        # Per-message tool selection, so every turn doesn't carry every tool's schema
+        self.router = None
+        routing = conf.get('tool_routing', {})
+        if routing.get('enabled', False):
+            always = list(routing.get('always', []))
+            if 'results' in self.active_tools and 'results' not in always:
+                # Truncated results need their pager available on the following turn
+                always.append('results')
+            self.router = ToolRouter(self.active_tools, **{**routing, 'always': always})
+
         self.chain = RamboChain(
             model=model,
             instruction=instruction_text,
             template=template,
             debug=kwargs.get('debug', False),
-            stream=False,
+            # Only the chat REPL streams; interfaces post whole replies
+            stream=kwargs.get('stream', False),
             assistant_prefix=conf['name'],
             cutoff=conf['cutoff'],
             active_tools=self.active_tools,
-        )
\ No newline at end of file
+            router=self.router,
+            tier_models=tier_models,
+            speculation=conf.get('speculation', {}),
+            quotas=QuotaManager(**conf['quotas']) if conf.get('quotas') else None,
+            archive=self.archive,
+        )
+
+    def load_model(self, model_file, tunables, model_pool=None):
+        """Load a model from the library, sharing it through `model_pool` when given."""
+        model_path = os.path.expandvars("{}/{}".format(
+            tunables.get('model_library', DEFAULTS["MODEL_LIBRARY"]),
+            model_file,
+        ))
+        if tunables.get('lazy_load', False):
+            # Rarely used bots only hold their models while they're active
+            load = lambda: LazyModel(
+                model_path,
+                idle_timeout=tunables.get('idle_unload', 900.0),
+                size_mb=tunables.get('model_memory_mb'),
+            )
+        else:
+            load = lambda: initializeModel(model_path)
+
+        if model_pool is None:
+            return load()
+        if model_path not in model_pool:
+            model_pool[model_path] = load()
+        return model_pool[model_path]
\ No newline at end of file
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from nothingburger.cli import bcolors
+from nothingburger.memory import ConversationalMemory
+from .assistant import Assistant
+from .daemon import generation_tunables
+from .context import current_message, current_chain
+from .tools.budget import estimate_tokens
+
+def read_prompts(path):
+    """Yield (id, record) for each prompt; records without an `id` are numbered by line.
+
+    Lines that aren't a usable prompt come back as a record holding only an `error`.
+    """
+    with open(path, "r") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield str(number), {'error': f"Line {number} is not valid JSON: {e}"}
+                continue
+            if isinstance(record, str):
+                record = {'prompt': record}
+            if not isinstance(record, dict):
+                yield str(number), {'error': f"Line {number} is neither an object nor a string"}
+                continue
+            prompt_id = str(record.get('id', number))
+            if not isinstance(record.get('prompt'), str):
+                yield prompt_id, {'error': f"Line {number} has no `prompt` string"}
+                continue
+            yield prompt_id, record
+
+def completed_ids(path):
+    """IDs already answered successfully in a previous, possibly interrupted, run."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # The last line of an interrupted run may be cut short
+                continue
+            # Hand-edited or foreign lines without an ID can't mark anything done
+            if isinstance(record, dict) and 'error' not in record and record.get('id') is not None:
+                done.add(str(record['id']))
+    return done
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)]
+
+def answer(chain, prompt_id, record, **kwargs):
+    """Run one prompt through the chain with a fresh memory, so prompts don't see each other."""
+    if 'error' in record:
+        return {'id': prompt_id, 'prompt': None, 'error': record['error'], 'latency': 0.0}
+    message = {
+        'id': prompt_id,
+        'sender': {'name': record.get('sender', 'User'), 'email': '', 'id': None},
+        'content': record['prompt'],
+        'channel': f"batch:{prompt_id}",
+        'source': 'batch',
+        'privacy': 'private_direct',
+        'privileged': True,
+    }
+    # Tools called while answering see the prompt as the message they act for
+    message_token = current_message.set(message)
+    chain_token = current_chain.set(chain)
+    started = time.perf_counter()
+    try:
+        response = chain.step(message['sender']['name'], record['prompt'], memory=ConversationalMemory(), **kwargs)
+        return {'id': prompt_id, 'prompt': record['prompt'], 'response': response, 'latency': time.perf_counter() - started}
+    except Exception as e:
+        return {'id': prompt_id, 'prompt': record['prompt'], 'error': f"{type(e).__name__}: {e}", 'latency': time.perf_counter() - started}
+    finally:
+        current_chain.reset(chain_token)
+        current_message.reset(message_token)
+
+def run_batch(conf, assistant_name, in_path, out_path, concurrency=1, **kwargs):
+    """Answer every prompt in `in_path`, appending results to `out_path` as they complete.
+
+    Prompts already answered in `out_path` are skipped, so an interrupted run
+    picks up where it left off; failed ones are tried again and the retry is
+    appended, so the last record for an ID wins. At most `concurrency` prompts
+    are in flight, and only twice that many are read ahead.
+    """
+    bot_conf = conf['enabled_bots'][assistant_name]
+    chain = Assistant(bot_conf, debug=kwargs.get('debug', False)).chain
+    tunables = generation_tunables(bot_conf)
+
+    done = completed_ids(out_path)
+    if done:
+        print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} Resuming, {len(done)} prompts already answered")
+
+    results = []
+    started = time.perf_counter()
+    with open(out_path, "a+") as out, ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        out.seek(0, os.SEEK_END)
+        if out.tell():
+            out.seek(out.tell() - 1)
+            if out.read(1) != "\n":
+                # Don't glue the first new record onto a line cut short by the interruption
+                out.write("\n")
+
+        pending = set()
+        prompts = ((prompt_id, record) for prompt_id, record in read_prompts(in_path) if prompt_id not in done)
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < concurrency * 2:
+                try:
+                    prompt_id, record = next(prompts)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(answer, chain, prompt_id, record, **tunables))
+            if not pending:
+                break
+
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                results.append(result)
+                status = "failed" if 'error' in result else f"{result['latency']:.2f}s"
+                print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} [{len(results)}] {result['id']} {status}")
+
+    elapsed = time.perf_counter() - started
+    summarize(results, elapsed)
+    return results
+
+def summarize(results, elapsed):
+    answered = [result for result in results if 'error' not in result]
+    if not results:
+        print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} Nothing to do")
+        return
+    latencies = [result['latency'] for result in answered]
+    tokens = sum(estimate_tokens(result['response'] or "") for result in answered)
+    print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} {len(answered)} answered, {len(results) - len(answered)} failed in {elapsed:.1f}s")
+    print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} {len(results) / elapsed:.2f} prompts/s, ~{tokens / elapsed:.1f} output tokens/s")
+    if latencies:
+        print(f"{bcolors.BOLD}Batch:{bcolors.ENDC} latency p50 {percentile(latencies, 50):.2f}s, p90 {percentile(latencies, 90):.2f}s, "
+              f"p99 {percentile(latencies, 99):.2f}s, max {max(latencies):.2f}s")
\ No newline at end of file
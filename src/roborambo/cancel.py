@@ -0,0 +1,71 @@
+import threading
+from .context import current_cancel
+
+class Cancelled(Exception):
+    """Raised at the next checkpoint once the work's token has been cancelled."""
+
+class CancelToken:
+    """Cooperative cancellation for the work done on behalf of one message.
+
+    Code checks the token at safe points (between generations, before and
+    after tool calls); `on_cancel` hooks let blocking waits give up early.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.reason = None
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            hooks, self.hooks = self.hooks, []
+        for hook in hooks:
+            hook()
+
+    def on_cancel(self, hook):
+        with self.lock:
+            if not self.event.is_set():
+                self.hooks.append(hook)
+                return
+        hook()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled(self.reason)
+
+def checkpoint():
+    """Raise `Cancelled` if the work running in this context has been cancelled."""
+    token = current_cancel.get()
+    if token is not None:
+        token.check()
+
+class CancellableMethod:
+    """Checks for cancellation before and after a tool call, so cancelled work stops calling tools."""
+
+    def __init__(self, method):
+        self.method = method
+        self.__wrapped__ = method
+        self.__name__ = method.__name__
+        self.__config__ = method.__config__
+
+    def __call__(self, *args, **kwargs):
+        checkpoint()
+        result = self.method(*args, **kwargs)
+        checkpoint()
+        return result
+
+    async def acall(self, **kwargs):
+        from .tools import aio
+        checkpoint()
+        result = await aio.acall(self.method, **kwargs)
+        checkpoint()
+        return result
\ No newline at end of file
@@ -1,21 +1,122 @@
+import re
+import time
+import logging
+import threading
+import contextvars
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from nothingburger.memory import ConversationalMemory
 from nothingburger.chains import ChatChain
 import nothingburger.templates as templates
+from ..context import current_message, current_chain, current_cancel
+from ..cancel import Cancelled, checkpoint
+
+log = logging.getLogger(__name__)
+
+# Set to a list while drafting speculatively: charges wait there until the draft is used
+deferred_charges = contextvars.ContextVar('deferred_charges', default=None)
 
 class RamboChain(ChatChain):
-    memory_db = {}
-    
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # Per-chain so bots sharing a process don't share conversations; least recently active are dropped first
+        self.memory_db = OrderedDict()
+        self.max_conversations = kwargs.get('max_conversations', 1024)
+        self.memory_lock = threading.Lock()
         self.cutoff_phrase = kwargs['cutoff']['phrase'].replace(" ", "").upper()
+        # Spaces and case are ignored, so match the phrase in one pass instead of copying the message
+        self.cutoff_pattern = re.compile(" *".join(re.escape(c) for c in self.cutoff_phrase), re.IGNORECASE)
         self.cutoff_hint = kwargs['cutoff']['hint']
         self.cutoff_message = kwargs['cutoff']['message']
         self.active_tools = kwargs.get('active_tools', {})
+        self.router = kwargs.get('router')
+        self.quotas = kwargs.get('quotas')
+        self.archive = kwargs.get('archive')
+
+        # Cheaper sibling chains for housekeeping calls; tiers without a model of their own use the main one
+        self.tiers = {'main': self}
+        for tier, model in kwargs.get('tier_models', {}).items():
+            self.tiers[tier] = ChatChain(
+                model=model,
+                instruction=self.instruction,
+                template=self.template,
+                debug=self.debug,
+                stream=False,
+                assistant_prefix=self.assistant_prefix,
+            )
+        self.tier_stats = {}
+        self.tier_lock = threading.Lock()
+
+        # Speculation: in group chats, start the reply while the classifier is still deciding.
+        # Concurrent generations on one model aren't safe for every backend, so it needs a
+        # separate classifier tier unless explicitly allowed
+        speculation = kwargs.get('speculation', {})
+        self.speculate = speculation.get('enabled', False) and ('classifier' in self.tiers or speculation.get('same_model', False))
+        if self.speculate:
+            max_in_flight = speculation.get('max_in_flight', 1)
+            self.speculation_slots = threading.BoundedSemaphore(max_in_flight)
+            self.speculation_pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="speculation")
+        self.speculation_stats = {}
+        self.speculation_lock = threading.Lock()
+
+    def tier_generate(self, tier, inp, **kwargs):
+        """Generate with the chain for `tier`, recording calls and latency per tier actually used."""
+        # Deciding whether a message is for the bot at all isn't the sender's doing
+        charge_sender = tier != 'classifier'
+        if tier not in self.tiers:
+            tier = 'main'
+        # Generations can't be interrupted midway, so cancelled work stops at the boundaries
+        checkpoint()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.tiers[tier].generate(inp, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.tier_lock:
+                stats = self.tier_stats.setdefault(tier, {'calls': 0, 'seconds': 0.0})
+                stats['calls'] += 1
+                stats['seconds'] += elapsed
+            log.debug("Tier %s: %.2fs", tier, elapsed)
+            # The prompt was spent even if the generation failed or its tool calls were cancelled
+            self.charge(tier, inp, response, charge_sender, **kwargs)
+        checkpoint()
+        return response
+
+    def charge(self, tier, inp, response, charge_sender=True, **kwargs):
+        """Count a generation against the quotas of the message it was for, with the model that ran it.
+
+        Without `charge_sender` only the channel's quota is charged.
+        """
+        message = current_message.get()
+        # Batch runs are operator work with a channel per prompt, which would only fill the quota tables
+        if self.quotas is None or message is None or message.get('source') == 'batch':
+            return
+        pending = deferred_charges.get()
+        if pending is not None:
+            pending.append((tier, inp, response, charge_sender, kwargs))
+            return
+        chain = self.tiers[tier]
+        memory = kwargs.get('memory')
+        history = "".join(m['content'] for m in memory.messages) if memory is not None else ""
+        instruction = kwargs.get('instruction', chain.instruction)
+        prompt_tokens = self.quotas.count_tokens(f"{instruction}{history}{inp}", chain.model)
+        completion_tokens = self.quotas.count_tokens(response, chain.model) if isinstance(response, str) else 0
+        user = message['sender']['email'] if charge_sender else None
+        self.quotas.record(user, message['channel'], prompt_tokens, completion_tokens)
+
+    def tier_report(self):
+        with self.tier_lock:
+            return {
+                tier: {**stats, 'mean_latency': stats['seconds'] / stats['calls']}
+                for tier, stats in self.tier_stats.items()
+            }
 
     def responsiveness_simple(self, message, assistant_prefix, **kwargs):
         """Determine if the assistant should respond to a message."""
-        assessment = self.generate(
+        assessment = self.tier_generate(
+            'classifier',
             message,
             instruction=f"Given the message in Input sent by a user, determine whether the assistant \"{assistant_prefix}\" should read it and indicate this with either a Yes or No. The Assistant should read the message if it is addressed to them. If they mention they don't want their message read by the assistant, it shouldn't read it",
             template=templates.getTemplate("chat_simple"),
@@ -27,27 +128,128 @@ class RamboChain(ChatChain):
         )
         return assessment.strip().upper().startswith("Y")
 
+    def conversation(self, message):
+        """Memory for the conversation a message belongs to (its source and channel), created on first use."""
+        key = (message.get('source', ''), message.get('channel', ''))
+        with self.memory_lock:
+            if key not in self.memory_db:
+                self.memory_db[key] = ConversationalMemory()
+                while len(self.memory_db) > self.max_conversations:
+                    self.memory_db.popitem(last=False)
+            self.memory_db.move_to_end(key)
+            return self.memory_db[key]
+
     def cutoff(self, msg, **kwargs): 
         """Check if message contains emergency cutoff phrase."""
-        return self.cutoff_phrase in msg.upper().replace(" ", "")
+        return self.cutoff_pattern.search(msg) is not None
     
     def step(self, sender, content, **kwargs):
         """Generate a single response step with function calling."""
         convmem = kwargs.get('memory', ConversationalMemory())
-        
-        # Always pass active_tools for function calling
-        kwargs['active_tools'] = self.active_tools
-        
-        response = self.generate(content, user_prefix=sender, **kwargs)
-        
-        # Add messages to memory
-        convmem.add_message(role=sender, content=content, timestamp=kwargs.get('timestamp', datetime.now()))
-        convmem.add_message(role=kwargs.get('assistant_prefix', self.assistant_prefix), content=response, timestamp=datetime.now())
-        
+        response = self.draft(sender, content, **kwargs)
+        self.commit(sender, content, response, convmem, **kwargs)
         return response
 
-    def run(self, message, callbacks, **kwargs):
+    def draft(self, sender, content, tools=True, **kwargs):
+        """Generate a reply without recording it anywhere."""
+        # Only offer the tools relevant to this message, so unrelated schemas don't bloat the prompt
+        if not tools:
+            kwargs['active_tools'] = {}
+        elif self.router is not None:
+            message = current_message.get() or {}
+            kwargs['active_tools'], saved = self.router.select(content, message.get('channel'))
+            log.debug("Tool routing: offering %s, saved ~%d schema tokens", ", ".join(kwargs['active_tools']) or "no tools", saved)
+        else:
+            kwargs['active_tools'] = self.active_tools
+        
+        return self.tier_generate('main', content, user_prefix=sender, **kwargs)
+
+    def commit(self, sender, content, response, convmem, **kwargs):
+        """Add a finished exchange to conversation memory and the archive."""
+        assistant_prefix = kwargs.get('assistant_prefix', self.assistant_prefix)
+        timestamp = kwargs.get('timestamp', datetime.now())
+        convmem.add_message(role=sender, content=content, timestamp=timestamp)
+        convmem.add_message(role=assistant_prefix, content=response, timestamp=datetime.now())
+
+        # Long-term archive; only enqueues, the write happens on the archive's own thread.
+        # Batch prompts aren't conversations anyone can come back to, so they aren't archived
+        message = current_message.get() or {}
+        if self.archive is not None and message.get('source') != 'batch':
+            channel = message.get('channel', '')
+            source = message.get('source', '')
+            self.archive.append(channel, sender, 'user', content, source=source, timestamp=timestamp)
+            self.archive.append(channel, assistant_prefix, 'assistant', response or "", source=source)
+
+    def count_speculation(self, channel, outcome):
+        with self.speculation_lock:
+            stats = self.speculation_stats.setdefault(channel, {'speculated': 0, 'hits': 0, 'wasted': 0, 'over_budget': 0, 'needs_tools': 0})
+            stats[outcome] += 1
+
+    def speculate_draft(self, sender, content, channel, **kwargs):
+        """Start drafting a reply before the classifier has decided; None if the budget is spent.
+
+        Tool calls can't be taken back if the classifier says no, so only
+        messages that wouldn't be offered any tools are drafted early.
+        """
+        if self.router is not None:
+            needs_tools = self.router.would_offer(content, channel)
+        else:
+            needs_tools = bool(self.active_tools)
+        if needs_tools:
+            self.count_speculation(channel, 'needs_tools')
+            return None
+        if not self.speculation_slots.acquire(blocking=False):
+            self.count_speculation(channel, 'over_budget')
+            return None
+        self.count_speculation(channel, 'speculated')
+
+        # Logging and cancellation checks still need to see the message
+        context = contextvars.copy_context()
+        # Only charged to the sender if the draft is used; see `respond`
+        charges = []
+        context.run(deferred_charges.set, charges)
+        future = self.speculation_pool.submit(context.run, self.draft, sender, content, tools=False, **kwargs)
+        future.add_done_callback(lambda f: self.speculation_slots.release())
+        future.charges = charges
+        return future
+
+    def discard(self, speculative, channel):
+        """Drop an unwanted draft if it hasn't started; a running one finishes and is thrown away uncharged."""
+        if speculative is not None:
+            speculative.cancel()
+            self.count_speculation(channel, 'wasted')
+
+    def speculation_report(self):
+        """Per-channel hit and waste rates, to judge where speculation pays off."""
+        with self.speculation_lock:
+            return {
+                channel: {
+                    **stats,
+                    'hit_rate': stats['hits'] / stats['speculated'] if stats['speculated'] else 0.0,
+                    'waste_rate': stats['wasted'] / stats['speculated'] if stats['speculated'] else 0.0,
+                }
+                for channel, stats in self.speculation_stats.items()
+            }
+
+    def run(self, message, callbacks, cancel=None, **kwargs):
         """Main conversation loop - simplified without text-based tool parsing."""
+        # Expose the message, chain and cancel token to tools invoked while it is being handled
+        message_token = current_message.set(message)
+        chain_token = current_chain.set(self)
+        cancel_token = current_cancel.set(cancel)
+        try:
+            return self.respond(message, callbacks, **kwargs)
+        except Cancelled as e:
+            # Edited, deleted or superseded; nothing was committed to memory or the archive
+            log.info("Cancelled handling of message: %s", e)
+            callbacks.get("cancelled", lambda m, r: None)(message, str(e))
+            return None
+        finally:
+            current_cancel.reset(cancel_token)
+            current_chain.reset(chain_token)
+            current_message.reset(message_token)
+
+    def respond(self, message, callbacks, **kwargs):
         if self.cutoff(message['content']):
             callbacks.get("cutoff", lambda x: None)(message)
             return
@@ -56,23 +258,42 @@ class RamboChain(ChatChain):
         content = message['content']
         privacy = message['privacy']
 
+        convmem = self.conversation(message)
+
         # Check if we should respond in group/public contexts
+        speculative = None
         if privacy in ['private_group', 'semipublic']:
+            if self.speculate:
+                # Nothing is committed to memory until the classifier says yes
+                speculative = self.speculate_draft(sender['name'], content, message['channel'], memory=convmem, **kwargs)
             if not self.responsiveness_simple(content, self.assistant_prefix, **kwargs):
+                self.discard(speculative, message['channel'])
+                return
+
+        # Admission control runs once the bot knows the message is for it (before any model call in direct
+        # messages), so chatter not meant for it never draws a notice; `tier_generate` counts each generation
+        if self.quotas is not None and not message.get('privileged', False):
+            exceeded = self.quotas.check(sender['email'], message['channel'])
+            if exceeded:
+                self.discard(speculative, message['channel'])
+                callbacks.get("quota", lambda m, i: None)(message, exceeded)
                 return
 
-        # Get or create conversation memory
-        convhash = hash("")  # Simple hash for now, could be improved with actual conversation context
-        if convhash not in self.memory_db: 
-            self.memory_db[convhash] = ConversationalMemory()
-        convmem = self.memory_db[convhash]
+        if speculative is not None:
+            self.count_speculation(message['channel'], 'hits')
 
         # Signal start of processing
         callbacks.get("start", lambda x: None)(message)
 
         # Generate response with function calling
         # All tool execution is handled automatically by the model adapter
-        response = self.step(sender['name'], content, memory=convmem, **kwargs)
+        if speculative is not None:
+            response = speculative.result()
+            for tier, inp, draft, charge_sender, draft_kwargs in speculative.charges:
+                self.charge(tier, inp, draft, charge_sender, **draft_kwargs)
+            self.commit(sender['name'], content, response, convmem, **kwargs)
+        else:
+            response = self.step(sender['name'], content, memory=convmem, **kwargs)
 
         # Signal completion
         callbacks.get("finish", lambda x: None)(message)
@@ -0,0 +1,150 @@
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from ..tools.catalog import get_catalog
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about also an and any are as at be but by can could did do does for from get give had has have how i if
+in into is it its just know let like me more my need no not of on or out please show so some tell that the
+their them then there these they this to us want was we were what when where which who why will with would
+you your
+""".split())
+
+def terms(text):
+    """Lowercased, lightly stemmed content words."""
+    found = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS or len(token) < 3:
+            continue
+        for suffix in ('ing', 'ed', 'es', 's'):
+            if len(token) > len(suffix) + 3 and token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        found.append(token)
+    return found
+
+class ToolRouter:
+    """Chooses which tools to offer the model for each message.
+
+    Tools are scored against the message by the words they share with the
+    tool's name, description, methods and configured keywords (weighted by how
+    few tools use each word). Decisions are cached per distinct set of words,
+    tools picked recently in a channel stay available for a few turns of
+    follow-up, and small talk gets no tools at all.
+    """
+
+    def __init__(self, tools, **kwargs):
+        self.tools = tools
+        self.max_tools = kwargs.get('max_tools', 3)
+        self.min_score = kwargs.get('min_score', 1.0)
+        # Tools scoring well below the best match are dropped as incidental
+        self.relative_score = kwargs.get('relative_score', 0.5)
+        self.sticky_turns = kwargs.get('sticky_turns', 2)
+        self.always = [slug for slug in kwargs.get('always', []) if slug in tools]
+        self.cache_size = kwargs.get('cache_size', 1024)
+        keywords = kwargs.get('keywords', {})
+
+        catalog = get_catalog()
+        self.profiles = {}
+        self.schema_tokens = {}
+        for slug in tools:
+            entry = catalog[slug]
+            profile = Counter()
+            for term in terms(f"{slug} {entry['name']}"):
+                profile[term] += 3
+            for term in terms(" ".join(keywords.get(slug, []))):
+                profile[term] += 3
+            for term in terms(entry['description']):
+                profile[term] += 1
+            for name, method in entry['methods'].items():
+                for term in terms(f"{name.replace('_', ' ')} {method['description']}"):
+                    profile[term] += 1
+                for arg in method['arguments'].values():
+                    for term in terms(arg['desc']):
+                        profile[term] += 0.5
+            self.profiles[slug] = profile
+            self.schema_tokens[slug] = len(json.dumps(catalog.schemas(slug))) // 4 + 1
+
+        # Words every tool mentions say nothing about which one is wanted
+        df = Counter(term for profile in self.profiles.values() for term in profile)
+        self.idf = {term: math.log(1 + len(tools) / count) for term, count in df.items()}
+
+        self.decisions = OrderedDict()
+        # Sticky tools per channel, for at most `cache_size` of the most recently active channels
+        self.recent = OrderedDict()
+        self.lock = threading.Lock()
+        self.turns = 0
+        self.tokens_saved = 0
+
+    def score(self, words):
+        scores = {}
+        for slug, profile in self.profiles.items():
+            scores[slug] = sum(profile[word] * self.idf[word] for word in words if word in profile)
+        return scores
+
+    def classify(self, content):
+        """Tools relevant to the message itself, most relevant first."""
+        words = frozenset(terms(content))
+        with self.lock:
+            if words in self.decisions:
+                self.decisions.move_to_end(words)
+                return self.decisions[words]
+
+        scores = self.score(words)
+        threshold = max(self.min_score, self.relative_score * max(scores.values(), default=0))
+        ranked = sorted((slug for slug in scores if scores[slug] >= threshold), key=lambda slug: -scores[slug])
+        decision = tuple(ranked[:self.max_tools])
+
+        with self.lock:
+            self.decisions[words] = decision
+            while len(self.decisions) > self.cache_size:
+                self.decisions.popitem(last=False)
+        return decision
+
+    def select(self, content, channel=None):
+        """Return the tools to offer for this message (slug -> Tool), and the schema tokens left out."""
+        decision = self.classify(content)
+        chosen = list(decision)
+
+        with self.lock:
+            recent = self.recent.pop(channel, {})
+            for slug in list(recent):
+                if slug not in chosen:
+                    chosen.append(slug)
+                recent[slug] -= 1
+                if recent[slug] <= 0:
+                    del recent[slug]
+            for slug in decision:
+                recent[slug] = self.sticky_turns
+            if recent:
+                self.recent[channel] = recent
+                while len(self.recent) > self.cache_size:
+                    self.recent.popitem(last=False)
+
+        for slug in self.always:
+            if slug not in chosen:
+                chosen.append(slug)
+
+        selected = {slug: self.tools[slug] for slug in chosen}
+        saved = sum(tokens for slug, tokens in self.schema_tokens.items() if slug not in selected)
+        with self.lock:
+            self.turns += 1
+            self.tokens_saved += saved
+        return selected, saved
+
+    def would_offer(self, content, channel=None):
+        """Whether `select` would offer any tools for this message, without counting it as a turn."""
+        with self.lock:
+            sticky = bool(self.recent.get(channel))
+        return bool(self.always or sticky or self.classify(content))
+
+    def stats(self):
+        return {
+            'turns': self.turns,
+            'tokens_saved': self.tokens_saved,
+            'tokens_saved_per_turn': self.tokens_saved / self.turns if self.turns else 0.0,
+            'schema_tokens': sum(self.schema_tokens.values()),
+        }
\ No newline at end of file
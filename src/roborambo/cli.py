@@ -1,29 +1,64 @@
+import time
 import argparse
 from nothingburger.cli import bcolors
-from .daemon import Daemon
+import asyncio
+from .daemon import Daemon, AsyncDaemon
 from .config import Reader as ConfigReader
 from .assistant import Assistant
+from .tools.budget import estimate_tokens
+from . import log as logs
 
 class Repl:
     def __init__(self, conf, **kwargs):
         bot = kwargs.get('assistant_name', 'Son of Rambo')
-        a = Assistant(conf['enabled_bots'][bot])
+        a = Assistant(conf['enabled_bots'][bot], stream=kwargs.get('stream', False), debug=kwargs.get('debug', False))
+        show_stats = kwargs.get('stats', False)
+        turns = []
 
         while True:
             raw_input = input(f"{bcolors.BOLD}{kwargs.get('user_identifier', 'User')} >{bcolors.ENDC} ")
             if raw_input in ("quit", "exit"):
                 break
 
+            started = time.perf_counter()
             result = a.chain.generate(raw_input)
             print(f"{bcolors.BOLD}{kwargs.get('assistant_identifier', 'Assistant')} >{bcolors.ENDC} ", end="")
             
             if a.chain.stream:
+                first_token = None
+                tokens = 0
+                last = {}
                 for p in result:
+                    if first_token is None and p['response']:
+                        first_token = time.perf_counter()
+                    tokens += 1
+                    last = p
                     print(p['response'], end='', flush=True)
                 print('\n')
+                # Backends that report the generated token count do so on the final part
+                tokens = last.get('eval_count', tokens)
             else:
+                first_token = time.perf_counter()
+                tokens = estimate_tokens(result)
                 print(result)
 
+            if show_stats:
+                finished = time.perf_counter()
+                first_token = first_token or finished
+                turn = {
+                    'ttft': first_token - started,
+                    'tokens': tokens,
+                    # Decode rate once output starts; without streaming the whole wait counts
+                    'tps': tokens / max((finished - first_token) if a.chain.stream and finished > first_token else (finished - started), 1e-6),
+                    'latency': finished - started,
+                }
+                turns.append(turn)
+                print(f"{bcolors.BOLD}Stats:{bcolors.ENDC} first token {turn['ttft']:.2f}s, {turn['tokens']} tokens at {turn['tps']:.1f} tokens/s, {turn['latency']:.2f}s total\n")
+
+        if turns:
+            mean = {key: sum(turn[key] for turn in turns) / len(turns) for key in turns[0]}
+            print(f"{bcolors.BOLD}Session:{bcolors.ENDC} {len(turns)} turns, mean first token {mean['ttft']:.2f}s, {mean['tps']:.1f} tokens/s, {mean['latency']:.2f}s total")
+
 def config_bot():
     """Launch the bot configuration TUI."""
     try:
@@ -33,6 +68,22 @@ def config_bot():
     except ImportError as e:
         print(f"Config TUI unavailable: {e}")
 
+def index_knowledgebase(conf, **kwargs):
+    """Build or incrementally update a bot's knowledgebase index."""
+    from .tools.knowledgebase import KnowledgebaseTool
+
+    tool_conf = dict(conf['enabled_bots'][kwargs['assistant_name']].get('tools', {}).get('knowledgebase', {}))
+    if kwargs.get('path'):
+        tool_conf['path'] = kwargs['path']
+    if kwargs.get('index_path'):
+        tool_conf['index_path'] = kwargs['index_path']
+
+    tool = KnowledgebaseTool(**tool_conf)
+    print(f"{bcolors.BOLD}Indexing{bcolors.ENDC} {tool.root} -> {tool.index.index_path}")
+    stats = tool.reindex()
+    print(f"{stats['documents']} documents, {stats['terms']} terms "
+          f"({stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, {stats['unchanged']} unchanged)")
+
 def run(**kwargs):
     parser = argparse.ArgumentParser(
         prog='roborambo',
@@ -46,9 +97,24 @@ def run(**kwargs):
     chat_parser = subparsers.add_parser('chat', help='Start an interactive chat session with a bot')
     chat_parser.add_argument('--debug', action='store_true', help='Enable debugging mode')
     chat_parser.add_argument('--assistant', help='Name of assistant to load', default='Son of Rambo')
+    chat_parser.add_argument('--stream', action='store_true', help='Print the reply as it is generated')
+    chat_parser.add_argument('--stats', action='store_true', help='Show time to first token, tokens/s and latency after each reply')
     
     serve_parser = subparsers.add_parser('serve', help='Start up daemon with messaging interfaces')
     serve_parser.add_argument('--debug', action='store_true', help='Enable debugging mode')
+    serve_parser.add_argument('--mode', choices=['process', 'async'], default='process', help='Run each interface in its own process, or every bot in one event loop')
+    
+    batch_parser = subparsers.add_parser('batch', help='Answer a JSONL file of prompts without an interface')
+    batch_parser.add_argument('--debug', action='store_true', help='Enable debugging mode')
+    batch_parser.add_argument('--assistant', help='Name of assistant to load', default='Son of Rambo')
+    batch_parser.add_argument('--in', dest='in_path', required=True, help='JSONL file of prompts, one {"id", "prompt"} object per line')
+    batch_parser.add_argument('--out', dest='out_path', required=True, help='JSONL file to append results to; an existing one is resumed')
+    batch_parser.add_argument('--concurrency', type=int, default=1, help='Prompts in flight at once (only above 1 for backends that serve concurrent requests)')
+    
+    index_parser = subparsers.add_parser('index', help='Build or update the knowledgebase index for a bot')
+    index_parser.add_argument('--assistant', help='Name of assistant whose knowledgebase config to use', default='Son of Rambo')
+    index_parser.add_argument('--path', help='Directory of documents to index (overrides bot config)')
+    index_parser.add_argument('--index', help='Directory to store the index in (overrides bot config)')
     
     # Legacy support
     parser.add_argument('--debug', action='store_true', help='Enable debugging mode')
@@ -56,6 +122,7 @@ def run(**kwargs):
     parser.add_argument('--assistant', help='Name of assistant to load', default='Son of Rambo')
 
     args = parser.parse_args()
+    logs.configure(debug=getattr(args, 'debug', False))
     
     if args.command == 'config-bot':
         config_bot()
@@ -68,24 +135,41 @@ def run(**kwargs):
             return
         
         print(f"{bcolors.BOLD}Starting chat with {args.assistant}{bcolors.ENDC}")
-        Repl(conf, assistant_name=args.assistant, debug=args.debug)
+        Repl(conf, assistant_name=args.assistant, debug=args.debug, stream=args.stream, stats=args.stats)
+        return
+    elif args.command == 'batch':
+        if args.concurrency < 1:
+            batch_parser.error("--concurrency must be at least 1")
+        conf = ConfigReader().read()
+        if args.assistant not in conf['enabled_bots']:
+            print(f"{bcolors.BOLD}Error:{bcolors.ENDC} Assistant '{args.assistant}' not found.")
+            return
+        from .batch import run_batch
+        run_batch(conf, args.assistant, args.in_path, args.out_path, concurrency=args.concurrency, debug=args.debug)
+        return
+    elif args.command == 'index':
+        conf = ConfigReader().read()
+        if args.assistant not in conf['enabled_bots']:
+            print(f"{bcolors.BOLD}Error:{bcolors.ENDC} Assistant '{args.assistant}' not found.")
+            return
+        index_knowledgebase(conf, assistant_name=args.assistant, path=args.path, index_path=args.index)
         return
     elif args.command == 'serve':
         conf = ConfigReader().read()
+        if args.mode == 'async':
+            asyncio.run(AsyncDaemon(conf, debug=args.debug).run())
+            return
         d = Daemon(conf, debug=args.debug)
-        for bot in d.bots:
-            for process in d.bots[bot]['processes']:
-                d.bots[bot]['processes'][process].start()
-                print(f"{bcolors.BOLD}{bot}:{bcolors.ENDC} Started {process}")
+        d.start()
+        d.supervise()
         return
     
     # Legacy mode
     if hasattr(args, 'serve') and args.serve:
         conf = ConfigReader().read()
         d = Daemon(conf, debug=args.debug)
-        for bot in d.bots:
-            for process in d.bots[bot]['processes']:
-                d.bots[bot]['processes'][process].start()
+        d.start()
+        d.supervise()
     else:
         conf = ConfigReader().read()
         if args.assistant not in conf['enabled_bots']:
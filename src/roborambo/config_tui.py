@@ -9,12 +9,31 @@ class BotConfigTUI:
         self.tools = {
             'web': {'name': 'Web Engine', 'default': True},
             'inspector': {'name': 'Tool Inspector', 'default': True},
+            'knowledgebase': {'name': 'Knowledgebase', 'default': False},
+            'vectorstore': {'name': 'Vector Store', 'default': False},
+            'recall': {'name': 'Conversation Recall', 'default': False},
         }
+        try:
+            from .tools import get_catalog
+            catalog = get_catalog()
+            # Testing and internal tools aren't offered
+            for slug in catalog.slugs():
+                if slug not in ('test', 'results'):
+                    self.tools[slug] = {
+                        'name': catalog[slug]['name'],
+                        'default': self.tools.get(slug, {}).get('default', False),
+                    }
+        except ImportError:
+            pass
         
         self.interfaces = {
             'zulip': {
                 'name': 'Zulip',
                 'fields': ['key', 'email', 'site']
+            },
+            'http': {
+                'name': 'HTTP (OpenAI-compatible endpoint)',
+                'fields': ['host', 'port']
             }
         }
 
@@ -118,6 +137,11 @@ class BotConfigTUI:
             config['web'] = {
                 'search_uri': self.get_input("Web search URI", "https://stract.com/beta/api/search")
             }
+
+        if 'knowledgebase' in enabled:
+            config['knowledgebase'] = {
+                'path': self.get_input("Knowledgebase directory", str(Path.home() / "knowledgebase"))
+            }
         
         return config
 
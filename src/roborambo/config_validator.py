@@ -18,8 +18,13 @@ class BotConfigValidator:
             'interfaces': ['enabled']
         }
         
-        self.available_tools = ['web', 'inspector']
-        self.available_interfaces = ['zulip']
+        try:
+            from .tools import get_catalog
+            self.available_tools = get_catalog().slugs()
+        except ImportError:
+            # Tool dependencies aren't installed; fall back to the known slugs
+            self.available_tools = ['web', 'inspector', 'test', 'knowledgebase', 'vectorstore', 'recall', 'results']
+        self.available_interfaces = ['zulip', 'http']
 
     def validate_file(self, filepath: str) -> Tuple[bool, List[str]]:
         """Validate a bot configuration file."""
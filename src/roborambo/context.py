@@ -0,0 +1,7 @@
+from contextvars import ContextVar
+
+# Set by RamboChain.run for the duration of a message, so tools can see who they're acting for
+current_message = ContextVar('current_message', default=None)
+current_chain = ContextVar('current_chain', default=None)
+# Cancellation token for the message being handled; see `cancel.py`
+current_cancel = ContextVar('current_cancel', default=None)
\ No newline at end of file
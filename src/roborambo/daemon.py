@@ -1,64 +1,266 @@
 import argparse
-from multiprocessing import Process
+import asyncio
+import signal
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from nothingburger.cli import bcolors
 from .interfaces import available_clients
 from .config import Reader as ConfigReader
 from .assistant import Assistant
+from .warmup import warm_up
+from .model_handle import manager as model_manager
+from .tools import Tool, aio
+from . import log as logs
+
+log = logging.getLogger(__name__)
+
+# Forking lets restarted workers inherit the parent's already-loaded models instead of reloading them
+if 'fork' in multiprocessing.get_all_start_methods():
+    mp = multiprocessing.get_context('fork')
+else:
+    mp = multiprocessing.get_context()
+
+def generation_tunables(bot_conf):
+    """Collect generation tunables for a bot, falling back to defaults."""
+    generation = bot_conf.get('tunables', {}).get('generation', {})
+    return {
+        'temperature': generation.get('temperature', 0.0),
+        'frequency_penalty': generation.get('frequency_penalty', 1.07),
+        'presence_penalty': generation.get('presence_penalty', 0.0),
+        'top_k': generation.get('top_k', -1),
+        'top_p': generation.get('top_p', 1.0),
+        'seed': generation.get('seed', 42),
+        'mirostat': generation.get('mirostat', {}).get('mode', 0),
+        'mirostat_eta': generation.get('mirostat', {}).get('eta', 0.1),
+        'mirostat_tau': generation.get('mirostat', {}).get('tau', 5.0),
+    }
+
+def build_clients(bot_conf, chain, tunables):
+    """Instantiate every enabled interface for a bot, keyed by colored process name."""
+    clients = {}
+    for client in bot_conf['interfaces']['enabled']:
+        instance = available_clients[client](
+            chain=chain,
+            **bot_conf['interfaces'][client],
+            tunables=tunables
+        )
+        instance.pname = f"{bcolors.BOLD}\x1b[38;2;{instance.consolecolor[0]};{instance.consolecolor[1]};{instance.consolecolor[2]}m{instance.consolename}{bcolors.ENDC}"
+        clients[instance.pname] = instance
+    return clients
 
 class Daemon:
     def __init__(self, conf, **kwargs):
+        daemon_conf = conf.get('daemon', {})
+        self.restart_backoff = daemon_conf.get('restart_backoff', 1.0)
+        self.restart_backoff_max = daemon_conf.get('restart_backoff_max', 60.0)
+        self.stable_after = daemon_conf.get('stable_after', 60.0)
+        self.drain_timeout = daemon_conf.get('drain_timeout', 30.0)
+        self.stopping = False
+        logs.configure(**{'debug': kwargs.get('debug', False), **daemon_conf.get('logging', {})})
+        aio.configure(daemon_conf.get('tool_threads'), **daemon_conf.get('http', {}))
+        model_manager.configure(budget_mb=daemon_conf.get('model_memory_budget_mb'))
+
         self.bots = {}
         for bot in conf['enabled_bots']:
             self.bots[bot] = {
                 'assistant': Assistant(conf['enabled_bots'][bot]),
+                'conf': conf['enabled_bots'][bot],
             }
 
-            self.tunables = {
-                'temperature': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('temperature', 0.0),
-                'frequency_penalty': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('frequency_penalty', 1.07),
-                'presence_penalty': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('presence_penalty', 0.0),
-                'top_k': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('top_k', -1),
-                'top_p': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('top_p', 1.0),
-                'seed': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('seed', 42),
-                'mirostat': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('mirostat', {}).get('mode', 0),
-                'mirostat_eta': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('mirostat', {}).get('eta', 0.1),
-                'mirostat_tau': conf['enabled_bots'][bot].get('tunables', {}).get('generation', {}).get('mirostat', {}).get('tau', 5.0),
-            }
+            self.tunables = generation_tunables(conf['enabled_bots'][bot])
 
-            clients = {}
+            # The daemon process itself is the warm template: it holds the loaded
+            # model, and every (re)started worker is forked from it
+            self.bots[bot]['clients'] = build_clients(conf['enabled_bots'][bot], self.bots[bot]['assistant'].chain, self.tunables)
             self.bots[bot]['processes'] = {}
-            for client in conf['enabled_bots'][bot]['interfaces']['enabled']:
-                clients[client] = available_clients[client](
-                    chain=self.bots[bot]['assistant'].chain, 
-                    **conf['enabled_bots'][bot]['interfaces'][client], 
-                    tunables=self.tunables
-                )
-                clients[client].pname = f"{bcolors.BOLD}\x1b[38;2;{clients[client].consolecolor[0]};{clients[client].consolecolor[1]};{clients[client].consolecolor[2]}m{clients[client].consolename}{bcolors.ENDC}"
-                
-                self.bots[bot]['processes'][clients[client].pname] = Process(
-                    target=clients[client].serve, 
-                    args=[], 
-                    kwargs={}
-                )
+            self.bots[bot]['supervision'] = {}
+            for pname in self.bots[bot]['clients']:
+                self.bots[bot]['processes'][pname] = self.spawn(bot, pname)
+                self.bots[bot]['supervision'][pname] = {
+                    'restarts': 0,
+                    'failures': 0,
+                    'started_at': None,
+                    'crashed_at': None,
+                    'restart_at': None,
+                    'last_recovery': None,
+                    'total_recovery': 0.0,
+                }
+
+    def spawn(self, bot, pname):
+        return mp.Process(
+            target=self.bots[bot]['clients'][pname].serve_supervised,
+            args=[],
+            kwargs={}
+        )
+
+    def start(self):
+        for bot in self.bots:
+            # Warm up before forking, so workers inherit the warmed model.  Bots are warmed one at a
+            # time: forking while another thread is generating could copy its locks mid-use
+            warm_up(bot, self.bots[bot]['assistant'].chain, self.bots[bot]['conf'], **generation_tunables(self.bots[bot]['conf']))
+            for client in self.bots[bot]['clients'].values():
+                client.ready.set()
+
+            for pname in self.bots[bot]['processes']:
+                self.bots[bot]['processes'][pname].start()
+                self.bots[bot]['supervision'][pname]['started_at'] = time.monotonic()
+                log.info("Started", extra=self.scope(bot, pname))
+
+    def scope(self, bot, pname):
+        return {'bot': bot, 'interface': self.bots[bot]['clients'][pname].sourcename}
+
+    def stop(self, *args):
+        """Ask every worker to finish its in-flight message and exit."""
+        self.stopping = True
+        for bot in self.bots:
+            for process in self.bots[bot]['processes'].values():
+                if process.is_alive():
+                    process.terminate()
+
+    def check(self, bot, pname, now):
+        """Restart a crashed worker once its backoff has elapsed; returns True while it should be watched."""
+        process = self.bots[bot]['processes'][pname]
+        state = self.bots[bot]['supervision'][pname]
+
+        if process.is_alive():
+            return True
+        if process.exitcode == 0 or self.stopping:
+            # Clean exits (including emergency cutoff) are final
+            return False
+
+        if state['crashed_at'] is None:
+            if now - state['started_at'] >= self.stable_after:
+                state['failures'] = 0
+            delay = min(self.restart_backoff * 2 ** state['failures'], self.restart_backoff_max)
+            state['crashed_at'] = now
+            state['restart_at'] = now + delay
+            state['failures'] += 1
+            log.warning("Exited with code %s, restarting in %.1fs", process.exitcode, delay, extra=self.scope(bot, pname))
+            return True
+
+        if now < state['restart_at']:
+            return True
+
+        process = self.spawn(bot, pname)
+        self.bots[bot]['processes'][pname] = process
+        process.start()
+
+        state['restarts'] += 1
+        state['started_at'] = time.monotonic()
+        state['last_recovery'] = state['started_at'] - state['crashed_at']
+        state['total_recovery'] += state['last_recovery']
+        state['crashed_at'] = None
+        log.info("Restarted (restart #%d, recovered in %.1fs)", state['restarts'], state['last_recovery'], extra=self.scope(bot, pname))
+        return True
+
+    def supervise(self, interval=0.5):
+        """Watch every worker until all have exited, restarting crashed ones with exponential backoff."""
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        watched = True
+        while watched and not self.stopping:
+            now = time.monotonic()
+            watched = False
+            for bot in self.bots:
+                for pname in list(self.bots[bot]['processes']):
+                    watched = self.check(bot, pname, now) or watched
+            time.sleep(interval)
+
+        # Drain: give workers time to finish in-flight messages before killing them
+        deadline = time.monotonic() + self.drain_timeout
+        for bot in self.bots:
+            for pname, process in self.bots[bot]['processes'].items():
+                process.join(max(deadline - time.monotonic(), 0))
+                if process.is_alive():
+                    log.warning("Did not drain in time, killing", extra=self.scope(bot, pname))
+                    process.kill()
+                    process.join()
+
+                state = self.bots[bot]['supervision'][pname]
+                if state['restarts']:
+                    log.info("Restarted %d time(s), mean recovery %.1fs", state['restarts'], state['total_recovery'] / state['restarts'], extra=self.scope(bot, pname))
+
+class AsyncDaemon:
+    """Runs every bot and interface as tasks on a single event loop.
+
+    Tool instances and models are shared between bots, and CPU-heavy tool steps
+    are sent to a small process pool instead of each bot carrying its own process.
+    """
+
+    def __init__(self, conf, **kwargs):
+        daemon_conf = conf.get('daemon', {})
+        self.tool_pool = {}
+        self.model_pool = {}
+        self.process_pool = ProcessPoolExecutor(max_workers=daemon_conf.get('process_pool_workers', 2))
+        Tool.process_pool = self.process_pool
+        logs.configure(**{'debug': kwargs.get('debug', False), **daemon_conf.get('logging', {})})
+        aio.configure(daemon_conf.get('tool_threads'), **daemon_conf.get('http', {}))
+        model_manager.configure(budget_mb=daemon_conf.get('model_memory_budget_mb'))
+
+        self.bots = {}
+        for bot in conf['enabled_bots']:
+            assistant = Assistant(
+                conf['enabled_bots'][bot],
+                tool_pool=self.tool_pool,
+                model_pool=self.model_pool,
+                debug=kwargs.get('debug', False),
+            )
+            self.bots[bot] = {
+                'assistant': assistant,
+                'conf': conf['enabled_bots'][bot],
+                'clients': build_clients(
+                    conf['enabled_bots'][bot],
+                    assistant.chain,
+                    generation_tunables(conf['enabled_bots'][bot]),
+                ),
+            }
+
+    async def warm_up(self, bot):
+        """Warm a bot's model off the loop, then let its interfaces connect."""
+        conf = self.bots[bot]['conf']
+        await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: warm_up(bot, self.bots[bot]['assistant'].chain, conf, **generation_tunables(conf)),
+        )
+        for client in self.bots[bot]['clients'].values():
+            client.ready.set()
+
+    async def run(self):
+        # Interface clients block on their own I/O, so give each one an executor thread, plus one per bot warm-up
+        loop = asyncio.get_running_loop()
+        clients = sum(len(self.bots[bot]['clients']) for bot in self.bots)
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=max(clients, 1) + len(self.bots) + 4))
+
+        tasks = []
+        for bot in self.bots:
+            tasks.append(asyncio.create_task(self.warm_up(bot)))
+            for pname, client in self.bots[bot]['clients'].items():
+                tasks.append(asyncio.create_task(client.aserve()))
+                log.info("Started", extra={'bot': bot, 'interface': client.sourcename})
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.process_pool.shutdown(cancel_futures=True)
 
 def serve(**kwargs):
     parser = argparse.ArgumentParser()
     parser.add_argument('--debug', action='store_true', help='Enable debugging mode')
+    parser.add_argument('--mode', choices=['process', 'async'], default='process', help='Run each interface in its own process, or every bot in one event loop')
     args = parser.parse_args()
 
     conf = ConfigReader().read()
-    d = Daemon(conf, **kwargs)
 
-    for bot in d.bots:
-        for process in d.bots[bot]['processes']:
-            d.bots[bot]['processes'][process].start()
-            print(f"{bcolors.BOLD}{bot}:{bcolors.ENDC} Started {process}")
+    if args.mode == 'async':
+        asyncio.run(AsyncDaemon(conf, debug=args.debug, **kwargs).run())
+        return
 
-    # Join the last process to keep daemon running
-    if d.bots:
-        last_bot = list(d.bots.keys())[-1]
-        last_process = list(d.bots[last_bot]['processes'].keys())[-1]
-        d.bots[last_bot]['processes'][last_process].join()
+    d = Daemon(conf, **kwargs)
+    d.start()
+    d.supervise()
 
-if __name__ == "__main__": 
+if __name__ == "__main__":
     serve()
\ No newline at end of file
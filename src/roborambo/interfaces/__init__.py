@@ -1,6 +1,8 @@
 from .messaging import MessagingInterface
 from .zulip import ZulipInterface
+from .http import HttpInterface
 
 available_clients = {
     'zulip': ZulipInterface,
+    'http': HttpInterface,
 }
\ No newline at end of file
@@ -0,0 +1,94 @@
+import time
+import threading
+
+def fragments(message):
+    """The original messages a (possibly merged) message was built from."""
+    return message.get('merged', [message])
+
+def merge(messages):
+    """One message standing for a burst: the latest message, carrying every fragment's text."""
+    messages = [fragment for message in messages for fragment in fragments(message)]
+    if len(messages) == 1:
+        return messages[0]
+    return {
+        **messages[-1],
+        'content': "\n".join(message['content'] for message in messages),
+        'merged': messages,
+    }
+
+class Coalescer:
+    """Merges bursts of messages from one sender in one conversation into a single turn.
+
+    A burst is flushed `window_ms` after its latest message, or `max_wait_ms`
+    after its first, whichever comes sooner. With no window every message is
+    flushed straight away.
+    """
+
+    def __init__(self, flush, window_ms=0, max_wait_ms=5000):
+        self.flush = flush
+        self.window = window_ms / 1000
+        self.max_wait = max_wait_ms / 1000
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.stats = {'messages': 0, 'turns': 0}
+
+    def add(self, key, message):
+        with self.lock:
+            self.stats['messages'] += 1
+        if not self.window:
+            return self.emit([message])
+
+        now = time.monotonic()
+        with self.lock:
+            burst = self.pending.get(key)
+            if burst is None:
+                burst = self.pending[key] = {'messages': [], 'first': now, 'timer': None}
+            burst['messages'].append(message)
+            if burst['timer'] is not None:
+                burst['timer'].cancel()
+            delay = min(self.window, burst['first'] + self.max_wait - now)
+            if delay > 0:
+                burst['timer'] = threading.Timer(delay, self.fire, args=(key, burst))
+                burst['timer'].daemon = True
+                burst['timer'].start()
+                return
+            del self.pending[key]
+        self.emit(burst['messages'])
+
+    def fire(self, key, burst):
+        with self.lock:
+            # A newer timer or an explicit flush got there first
+            if self.pending.get(key) is not burst:
+                return
+            del self.pending[key]
+        self.emit(burst['messages'])
+
+    def emit(self, messages):
+        with self.lock:
+            self.stats['turns'] += 1
+        self.flush(messages)
+
+    def revise(self, message_id, content=None):
+        """Edit (or with no content, drop) a message still waiting in a burst; returns False if none was."""
+        with self.lock:
+            for key, burst in self.pending.items():
+                for i, message in enumerate(burst['messages']):
+                    if message['id'] != message_id:
+                        continue
+                    if content is not None:
+                        burst['messages'][i] = {**message, 'content': content}
+                    else:
+                        del burst['messages'][i]
+                        if not burst['messages']:
+                            burst['timer'].cancel()
+                            del self.pending[key]
+                    return True
+        return False
+
+    def report(self):
+        with self.lock:
+            return {
+                **self.stats,
+                'pending': sum(len(burst['messages']) for burst in self.pending.values()),
+                'calls_saved': self.stats['messages'] - self.stats['turns'],
+            }
\ No newline at end of file
@@ -0,0 +1,348 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
+from .messaging import MessagingInterface
+from ..tools.budget import estimate_tokens
+
+log = logging.getLogger(__name__)
+
+# Request fields passed through to generation, overriding the bot's tunables for that request
+GENERATION_FIELDS = ('temperature', 'top_p', 'top_k', 'max_tokens', 'seed', 'stop', 'presence_penalty', 'frequency_penalty')
+
+class HttpError(Exception):
+    def __init__(self, status, message, kind='invalid_request_error'):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+class HttpInterface(MessagingInterface):
+    """Local HTTP endpoint speaking the OpenAI chat completions API.
+
+    Each request is mapped onto `RamboChain.run`; the conversation is taken
+    from `conversation_id` (or the `X-Conversation-Id` header) so memory
+    carries over between requests, and a fresh one is started and returned
+    when none is given. Connections are kept alive, and generations run on a
+    pool of `workers` threads while the event loop keeps accepting requests.
+
+    Callers are identified only by their API key: privilege comes from the
+    key's configuration, never from the request, and conversations are kept
+    apart per key. Without keys every caller is the same anonymous user and
+    can continue any conversation whose ID it knows.
+    """
+
+    consolecolor = (120, 200, 120)
+    consolename = "HTTP"
+    sourcename = "http"
+
+    def __init__(self, chain, **kwargs):
+        super().__init__(chain, **kwargs)
+        self.chain = chain
+        self.tunables = kwargs['tunables']
+        self.host = kwargs.get('host', '127.0.0.1')
+        self.port = kwargs.get('port', 8080)
+        # Each key names a caller, e.g. {key = "sk-...", name = "alice", privileged = true}
+        self.api_keys = {}
+        for number, entry in enumerate(kwargs.get('api_keys', [])):
+            self.api_keys[entry['key']] = {'name': f"key{number}", 'privileged': False, **entry}
+        if kwargs.get('api_key'):
+            self.api_keys[kwargs['api_key']] = {'key': kwargs['api_key'], 'name': 'default', 'privileged': False}
+        self.model_name = kwargs.get('model_name', chain.assistant_prefix)
+        self.keepalive_timeout = kwargs.get('keepalive_timeout', 75.0)
+        self.max_body = kwargs.get('max_body_kb', 1024) * 1024
+        # Only raise above 1 for backends that handle concurrent generations
+        self.workers = ThreadPoolExecutor(max_workers=kwargs.get('workers', 1), thread_name_prefix="http")
+        self.server = None
+        self.loop = None
+        self.requests = 0
+
+    def serve(self, **kwargs):
+        asyncio.run(self.listen())
+
+    async def aserve(self, **kwargs):
+        # Already asynchronous, so it runs on the daemon's loop rather than in an executor thread
+        while not self.ready.is_set():
+            await asyncio.sleep(0.1)
+        await self.listen()
+
+    async def listen(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        log.info("Listening on http://%s:%s/v1/chat/completions", self.host, self.port, extra=self.scope)
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def finish(self):
+        if self.supervised and self.loop is not None and threading.current_thread() is threading.main_thread():
+            # Exiting inside a connection handler is reported as a crash; exit from the loop itself instead
+            self.loop.call_soon(super().finish)
+            return
+        super().finish()
+
+    def shutdown(self):
+        super().shutdown()
+        if self.server is not None:
+            # Usually called from a worker thread; the server belongs to the event loop
+            self.loop.call_soon_threadsafe(self.server.close)
+
+    async def read_request(self, reader):
+        """Parse one HTTP/1.1 request, or return None once the client is done with the connection."""
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        except asyncio.TimeoutError:
+            return None
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', ''):
+            raise HttpError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length', 0) or 0)
+        except ValueError:
+            raise HttpError(400, "Content-Length is not a number")
+        if length < 0:
+            raise HttpError(400, "Content-Length is negative")
+        if length > self.max_body:
+            raise HttpError(413, f"Request body over {self.max_body} bytes")
+        body = await reader.readexactly(length) if length else b''
+
+        if version == 'HTTP/1.0':
+            keep_alive = headers.get('connection', '').lower() == 'keep-alive'
+        else:
+            keep_alive = headers.get('connection', '').lower() != 'close'
+        return {'method': method, 'path': target.split('?', 1)[0], 'headers': headers, 'body': body, 'keep_alive': keep_alive}
+
+    def write_head(self, writer, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        headers = {**headers, 'Connection': 'keep-alive' if keep_alive else 'close'}
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+
+    def write_json(self, writer, status, data, keep_alive, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.write_head(writer, status, {**(headers or {}), 'Content-Type': 'application/json', 'Content-Length': len(body)}, keep_alive)
+        writer.write(body)
+
+    def write_error(self, writer, error, keep_alive):
+        self.write_json(writer, error.status, {'error': {'message': str(error), 'type': error.kind}}, keep_alive)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as e:
+                    self.write_error(writer, e, False)
+                    break
+                if request is None:
+                    break
+                if self.draining:
+                    self.write_error(writer, HttpError(503, "Shutting down", 'server_error'), False)
+                    await writer.drain()
+                    break
+                # Counted until the response is written, so a drain doesn't exit with it still unsent
+                with self.processing():
+                    try:
+                        await self.route(request, writer)
+                    except HttpError as e:
+                        self.write_error(writer, e, request['keep_alive'])
+                    await writer.drain()
+                if not request['keep_alive']:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    def authenticate(self, headers):
+        """The configured caller for the request's bearer key; anonymous when no keys are configured."""
+        if not self.api_keys:
+            return {'name': 'anonymous', 'privileged': False}
+        scheme, _, key = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or key.strip() not in self.api_keys:
+            raise HttpError(401, "Invalid API key", 'authentication_error')
+        return self.api_keys[key.strip()]
+
+    async def route(self, request, writer):
+        caller = self.authenticate(request['headers'])
+
+        if request['path'] == '/v1/chat/completions':
+            if request['method'] != 'POST':
+                raise HttpError(405, "Use POST")
+            return await self.chat_completions(request, writer, caller)
+        if request['path'] == '/v1/models' and request['method'] == 'GET':
+            return self.write_json(writer, 200, {'object': 'list', 'data': [{'id': self.model_name, 'object': 'model', 'owned_by': 'roborambo'}]}, request['keep_alive'])
+        if request['path'] == '/health' and request['method'] == 'GET':
+            return self.write_json(writer, 200, {'status': 'ok', 'in_flight': self.in_flight, 'requests': self.requests}, request['keep_alive'])
+        raise HttpError(404, f"No route for {request['method']} {request['path']}")
+
+    def build_message(self, body, headers, caller):
+        try:
+            messages = body['messages']
+            content = messages[-1]['content']
+        except (KeyError, IndexError, TypeError):
+            raise HttpError(400, "`messages` must be a non-empty list of {role, content} objects")
+        if isinstance(content, list):
+            # Content parts; only the text is used
+            content = "".join(part.get('text', '') for part in content if isinstance(part, dict))
+
+        conversation_id = body.get('conversation_id') or headers.get('x-conversation-id') or uuid.uuid4().hex
+        # `user` only names the speaker; quotas and privilege follow the key
+        user = body.get('user') or 'User'
+        message = {
+            'id': uuid.uuid4().hex,
+            'sender': {'name': user, 'email': f"{caller['name']}@http", 'id': caller['name']},
+            'recips': [],
+            'source': self.sourcename,
+            'content': content,
+            # Namespaced by caller, so one key can't read or continue another's conversations
+            'channel': f"{caller['name']}:{conversation_id}",
+            'conversation_id': conversation_id,
+            'server': 'default',
+            'visibility': 'private',
+            'privacy': 'private_direct',
+            'secure': False,
+            'privileged': bool(caller.get('privileged', False)),
+        }
+
+        memory = self.chain.conversation(message)
+        if not memory.messages:
+            # A new conversation starts from whatever history the client sent along
+            for earlier in messages[:-1]:
+                if earlier.get('role') in ('user', 'assistant') and isinstance(earlier.get('content'), str):
+                    role = user if earlier['role'] == 'user' else self.chain.assistant_prefix
+                    memory.add_message(role=role, content=earlier['content'])
+        return message
+
+    def generate(self, message, overrides):
+        """Run the chain for one request on a worker thread; returns (outcome, text)."""
+        outcome = {'kind': 'stop', 'text': None}
+
+        def cutoff(m):
+            outcome['kind'], outcome['text'] = 'cutoff', "Emergency cutoff activated."
+
+        def quota(m, info):
+            outcome['kind'], outcome['text'] = 'quota', info.get('notice', "Usage quota exceeded.")
+
+        callbacks = {
+            'cutoff': cutoff,
+            'quota': quota,
+            'tool': lambda m, i: None,
+        }
+        response = self.chain.run(
+            message,
+            callbacks=callbacks,
+            assistant_prefix=self.chain.assistant_prefix,
+            **{**self.tunables, **overrides},
+        )
+        if response is not None:
+            outcome['text'] = response
+        return outcome
+
+    async def chat_completions(self, request, writer, caller):
+        try:
+            body = json.loads(request['body'] or b'{}')
+        except ValueError:
+            raise HttpError(400, "Request body is not valid JSON")
+        message = self.build_message(body, request['headers'], caller)
+        overrides = {field: body[field] for field in GENERATION_FIELDS if field in body}
+        stream = body.get('stream', False)
+        self.requests += 1
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        headers = {'X-Conversation-Id': message['conversation_id']}
+        keep_alive = request['keep_alive']
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.workers, self.generate, message, overrides)
+
+        if stream:
+            # The chain returns whole replies, so the stream opens at once and the text follows when ready
+            self.write_head(writer, 200, {**headers, 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'Transfer-Encoding': 'chunked'}, keep_alive)
+            self.write_event(writer, self.chunk(completion_id, created, {'role': 'assistant'}))
+            await writer.drain()
+            while True:
+                done, _ = await asyncio.wait([task], timeout=15)
+                if done:
+                    break
+                # Keeps proxies and clients with read timeouts from giving up on a slow generation
+                self.write_chunk(writer, b": keep-alive\n\n")
+                await writer.drain()
+            try:
+                outcome = task.result()
+            except Exception as e:
+                # The status line is already sent; tell the client in-stream, then end it properly
+                log.error("Generation failed", exc_info=True, extra=self.scope)
+                self.write_event(writer, {'error': {'message': f"Generation failed: {type(e).__name__}", 'type': 'server_error'}})
+                self.write_chunk(writer, b"data: [DONE]\n\n")
+                self.write_chunk(writer, b"")
+                return
+            if outcome['text']:
+                self.write_event(writer, self.chunk(completion_id, created, {'content': outcome['text']}))
+            self.write_event(writer, self.chunk(completion_id, created, {}, self.finish_reason(outcome)))
+            self.write_chunk(writer, b"data: [DONE]\n\n")
+            self.write_chunk(writer, b"")
+        else:
+            try:
+                outcome = await task
+            except Exception as e:
+                log.error("Generation failed", exc_info=True, extra=self.scope)
+                raise HttpError(500, f"Generation failed: {type(e).__name__}", 'server_error')
+            if outcome['kind'] == 'quota':
+                raise HttpError(429, outcome['text'], 'rate_limit_error')
+            text = outcome['text'] or ""
+            prompt_tokens = estimate_tokens(message['content'])
+            completion_tokens = estimate_tokens(text)
+            self.write_json(writer, 200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': self.model_name,
+                'conversation_id': message['conversation_id'],
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': self.finish_reason(outcome)}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens, 'total_tokens': prompt_tokens + completion_tokens},
+            }, keep_alive, headers)
+
+        if outcome['kind'] == 'cutoff':
+            # Same as the other interfaces: the cutoff phrase stops the bot
+            await writer.drain()
+            self.server.close()
+
+    def finish_reason(self, outcome):
+        return 'content_filter' if outcome['kind'] in ('cutoff', 'quota') else 'stop'
+
+    def chunk(self, completion_id, created, delta, finish_reason=None):
+        return {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': created,
+            'model': self.model_name,
+            'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+        }
+
+    def write_event(self, writer, data):
+        self.write_chunk(writer, f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+    def write_chunk(self, writer, data):
+        writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
\ No newline at end of file
@@ -1,17 +1,62 @@
+import os
 import re
+import sys
+import time
+import signal
+import asyncio
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from .pipeline import Pipeline
+from ..cancel import CancelToken
+from .. import log as logs
+
+log = logging.getLogger(__name__)
+
+# Compiled once; parses `key = value` pairs following a TUNE command
+TUNE_ARGUMENT = re.compile(r"(?i)(\w+)\s?\=\s?(?:((?:true)|(?:false))|('[^'\|\n)]+')|(\"[^\"\|\n)]+\")|(\[.*\])|(\{.*\})|(\d+.\d+)|(\w+))?")
 
 class MessagingInterface:
+    consolename = "Messaging"
+    sourcename = "messaging"
     emoji = {}
 
+    # Pre-processing stages run on every incoming message, cheapest first
+    pipeline_stages = [
+        {'name': 'command', 'check': 'handle_command', 'cost': 10},
+    ]
+
     def __init__(self, chain, **kwargs):
+        self.chain = chain
         self.tunables = kwargs.get('tunables', {})
         self.privileged_users = kwargs.get('privileged_users', [])
-    
+        self.pipeline = Pipeline.compile(self, self.pipeline_stages)
+        self.in_flight = 0
+        self.draining = False
+        self.lock = threading.Lock()
+        # Work started or queued per message, so an edit, delete or quick follow-up can cancel it
+        self.active = {}
+        self.supersede_window = kwargs.get('supersede_window', 10.0)
+        self.cancellations = Counter()
+        # Set once the bot's model is warm; serving waits for it so the first message isn't slow
+        self.ready = threading.Event()
+        # Only an interface with a process of its own may end the process when it stops
+        self.supervised = False
+        self.stopped = threading.Event()
+
+    @property
+    def scope(self):
+        """Log fields naming this bot and interface, for records outside a message."""
+        return {'bot': getattr(self.chain, 'assistant_prefix', None), 'interface': self.sourcename}
+
     def start_callback(self, message, **kwargs): pass
     def tool_callback(self, message, **kwargs): pass
     def finish_callback(self, message, **kwargs): pass
     def write_callback(self, message, **kwargs): pass
     def cutoff_callback(self, message, **kwargs): pass
+    def quota_callback(self, message, info, **kwargs): pass
+    def cancelled_callback(self, message, reason, **kwargs): pass
     def success_callback(self, message, **kwargs): pass
     def failure_callback(self, message, **kwargs): pass
     def warning_callback(self, message, **kwargs): pass
@@ -23,44 +68,180 @@ class MessagingInterface:
     def remove_reaction(self, mid, emoji, **kwargs): pass
     def get_room_info(self, message, **kwargs): pass
 
-    def handle_message(self, message, **kwargs):
+    def handle_command(self, message, **kwargs):
         content = message['content']
-        
+
+        # Single prefix check covers both TUNABLES and TUNE
+        if not content.startswith("TUNE"):
+            return False
+
+        if message.get('sender_email') not in self.privileged_users:
+            self.add_reaction(message['id'], 'noaccess')
+            return True
+
         if content.startswith("TUNABLES"):
-            if message.get('sender_email') not in self.privileged_users:
-                self.add_reaction(message['id'], 'noaccess')
-                return True
-            
             # Handle tunables display - implementation depends on specific interface
             return True
 
-        if content.startswith("TUNE"):
-            if message.get('sender_email') not in self.privileged_users:
-                self.add_reaction(message['id'], 'noaccess')
-                return True
-            
-            # Parse tune parameters
-            tune_args = {}
-            for arg in re.findall(r"(?i)(\w+)\s?\=\s?(?:((?:true)|(?:false))|('[^'\|\n)]+')|(\"[^\"\|\n)]+\")|(\[.*\])|(\{.*\})|(\d+.\d+)|(\w+))?", content[5:]):
-                if arg[1]:  # Boolean
-                    value = (arg[1].lower() == 'true')
-                if arg[2] or arg[3]:  # String
-                    value = (arg[2] + arg[3])[1:-1]
-                if arg[4]:  # Array/list
-                    value = arg[4][1:-1]
-                if arg[5]:  # Object
-                    value = arg[5][1:-1]
-                if arg[6]:  # Float
-                    value = float(arg[6])
-                if arg[7] and arg[7].isnumeric():  # Int
-                    value = int(arg[7])
-
-                tune_args[arg[0]] = value
-            
-            self.tunables.update(tune_args)
-            self.add_reaction(message['id'], 'success')
-            return True
+        # Parse tune parameters
+        tune_args = {}
+        for arg in TUNE_ARGUMENT.findall(content, 5):
+            if arg[1]:  # Boolean
+                value = (arg[1].lower() == 'true')
+            if arg[2] or arg[3]:  # String
+                value = (arg[2] + arg[3])[1:-1]
+            if arg[4]:  # Array/list
+                value = arg[4][1:-1]
+            if arg[5]:  # Object
+                value = arg[5][1:-1]
+            if arg[6]:  # Float
+                value = float(arg[6])
+            if arg[7] and arg[7].isnumeric():  # Int
+                value = int(arg[7])
+
+            tune_args[arg[0]] = value
+
+        self.tunables.update(tune_args)
+        self.add_reaction(message['id'], 'success')
+        return True
+
+    def handle_message(self, message, **kwargs):
+        """Run the pre-processing pipeline; returns True if a stage consumed the message."""
+        return self.pipeline.run(message, **kwargs) is not None
+
+    def begin(self, message_id, key=None, message=None, aliases=()):
+        """Register work for a message and return the token that cancels it.
+
+        `aliases` are other message IDs the work also answers for, such as the
+        earlier messages of a merged burst.
+        """
+        token = CancelToken()
+        entry = {'token': token, 'key': key, 'message': message, 'started': time.monotonic(), 'ids': {message_id, *aliases}}
+        with self.lock:
+            for mid in entry['ids']:
+                self.active[mid] = entry
+        return token
+
+    def end(self, token):
+        with self.lock:
+            # An edit may already have registered a replacement under some of the same IDs
+            for mid in [mid for mid, entry in self.active.items() if entry['token'] is token]:
+                del self.active[mid]
+
+    def cancel_message(self, message_id, reason):
+        """Cancel the work for a message; returns its registration if it was still running."""
+        with self.lock:
+            entry = self.active.get(message_id)
+        if entry is None or entry['token'].cancelled:
+            return None
+        entry['token'].cancel(reason)
+        self.cancellations[reason] += 1
+        log.info("Cancelled message %s (%s)", message_id, reason, extra={**self.scope, 'message_id': message_id})
+        return entry
+
+    def supersede(self, key, message_id):
+        """Cancel recent work from the same sender in the same conversation that a newer message replaces.
+
+        Returns the registrations that were cancelled.
+        """
+        if not self.supersede_window:
+            return []
+        now = time.monotonic()
+        with self.lock:
+            # A merged turn appears once per fragment; cancelling it again is a no-op
+            stale = [
+                mid for mid, entry in self.active.items()
+                if message_id not in entry['ids'] and entry['key'] == key and now - entry['started'] <= self.supersede_window
+            ]
+        cancelled = [self.cancel_message(mid, 'superseded') for mid in stale]
+        return [entry for entry in cancelled if entry is not None]
+
+    @contextmanager
+    def processing(self):
+        """Track an in-flight message so a drain can wait for it to finish."""
+        with self.lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                idle = not self.in_flight
+            if self.draining and idle:
+                self.finish()
+
+    def drain(self, *args):
+        """Stop accepting work; exit now if idle, otherwise once the in-flight message completes."""
+        self.draining = True
+        if not self.in_flight:
+            self.exit()
+
+    def stats(self):
+        """Counters for this run, logged when the interface exits."""
+        return {'pipeline': self.pipeline.stats(), 'cancellations': dict(self.cancellations)}
+
+    def finish(self):
+        """Called once drained: end the process if it's ours alone, otherwise only this interface."""
+        if not self.supervised:
+            self.shutdown()
+            return
+        if threading.current_thread() is threading.main_thread():
+            self.exit()
+        # Only the main thread can end the process; it exits from the drain handler now that we're idle
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def shutdown(self):
+        """Stop serving without touching the rest of the process, which other bots may share."""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        stats = self.stats()
+        log.info("Stopped; stats %s", stats, extra={**self.scope, 'data': stats})
+
+    def exit(self):
+        # A second SIGTERM during interpreter shutdown would interrupt joining the worker threads
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        stats = self.stats()
+        log.info("Exiting; stats %s", stats, extra={**self.scope, 'data': stats})
+        sys.exit(0)
+
+    def stop(self):
+        """Stop for good, from any thread: finish in-flight work, then exit cleanly so a supervisor doesn't restart us.
+
+        In a process shared with other interfaces (async mode) only this one stops.
+        """
+        with self.lock:
+            self.draining = True
+            idle = not self.in_flight
+        if not idle:
+            # `processing` finishes once the last message is done
+            return
+        self.finish()
+
+    def serve(self, **kwargs): pass
 
-        return False
+    def serve_supervised(self, **kwargs):
+        """Entry point for supervised worker processes."""
+        self.supervised = True
+        signal.signal(signal.SIGTERM, self.drain)
+        # The supervisor handles Ctrl-C and forwards a SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.ready.wait()
+        try:
+            self.serve(**kwargs)
+        except Exception:
+            # Worker processes never reach sys.excepthook; keep the lead-up before the supervisor restarts us
+            log.critical("Interface crashed", exc_info=True, extra=self.scope)
+            logs.dump("crash")
+            raise
 
-    def serve(self, **kwargs): pass
\ No newline at end of file
+    async def aserve(self, **kwargs):
+        """Serve as an event loop task; blocking clients run on the loop's executor."""
+        while not self.ready.is_set():
+            await asyncio.sleep(0.1)
+        serving = asyncio.get_running_loop().run_in_executor(None, lambda: self.serve(**kwargs))
+        # Some clients can't be interrupted mid-poll; once stopped they ignore new messages and the task ends
+        while not self.stopped.is_set():
+            done, _ = await asyncio.wait([serving], timeout=0.5)
+            if done:
+                return serving.result()
\ No newline at end of file
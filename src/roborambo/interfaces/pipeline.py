@@ -0,0 +1,52 @@
+import time
+
+class Stage:
+    """A single pre-processing check. Returning a truthy value consumes the message."""
+
+    def __init__(self, name, check, cost=0):
+        self.name = name
+        self.check = check
+        self.cost = cost
+        self.calls = 0
+        self.hits = 0
+        self.elapsed_ns = 0
+
+    def __call__(self, message, **kwargs):
+        start = time.perf_counter_ns()
+        result = self.check(message, **kwargs)
+        self.elapsed_ns += time.perf_counter_ns() - start
+        self.calls += 1
+        if result:
+            self.hits += 1
+        return result
+
+class Pipeline:
+    """Ordered set of stages, compiled once and run cheapest-first with early exit."""
+
+    def __init__(self, stages):
+        self.stages = sorted(stages, key=lambda stage: stage.cost)
+
+    @classmethod
+    def compile(cls, owner, spec):
+        """Build a pipeline from a declarative spec of `{'name', 'check', 'cost'}` entries bound to `owner`."""
+        return cls([
+            Stage(entry['name'], getattr(owner, entry['check']), entry.get('cost', 0))
+            for entry in spec
+        ])
+
+    def run(self, message, **kwargs):
+        """Return the name of the stage that consumed the message, or None if it passed every stage."""
+        for stage in self.stages:
+            if stage(message, **kwargs):
+                return stage.name
+        return None
+
+    def stats(self):
+        return {
+            stage.name: {
+                'calls': stage.calls,
+                'hits': stage.hits,
+                'mean_us': (stage.elapsed_ns / stage.calls / 1000) if stage.calls else 0.0,
+            }
+            for stage in self.stages
+        }
\ No newline at end of file
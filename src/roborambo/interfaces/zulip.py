@@ -1,18 +1,34 @@
-import sys
+import os
 import re
+import json
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from zulip import Client as ZulipClient
 from .messaging import MessagingInterface
+from .coalesce import Coalescer, merge, fragments
+from .. import DEFAULTS
+
+log = logging.getLogger(__name__)
+
+THINK_BLOCK = re.compile(r'<think>(.*?)</think>', re.DOTALL | re.IGNORECASE)
 
 class ZulipInterface(MessagingInterface):
     consolecolor = (40, 177, 249)
     consolename = "Zulip"
     sourcename = "zulip"
 
+    pipeline_stages = MessagingInterface.pipeline_stages + [
+        {'name': 'self', 'check': 'is_own_message', 'cost': 0},
+    ]
+
     def __init__(self, chain, **kwargs):
         super().__init__(chain, **kwargs)
         self.emoji = {
             "look": "eyes", "write": "pencil", "success": "check", 
-            "failure": "cross mark", "noaccess": "prohibited"
+            "failure": "cross mark", "noaccess": "prohibited",
+            "quota": "hourglass",
         }
 
         self.client = ZulipClient(
@@ -25,6 +41,43 @@ class ZulipInterface(MessagingInterface):
         self.chain = chain
         self.profile = self.client.get_profile()
         self.tunables = kwargs['tunables']
+
+        # Event queue mode manages its own queue instead of `call_on_each_message`
+        self.event_queue = kwargs.get('event_queue', False)
+        # Edits and deletions cancel the work for the message they change
+        self.event_types = ['message', 'update_message', 'delete_message']
+        self.cancel_on_edit = kwargs.get('cancel_on_edit', True)
+        # Messages are handled off the polling thread so edits and deletions arrive while a reply is generating
+        self.workers = ThreadPoolExecutor(max_workers=kwargs.get('workers', 1), thread_name_prefix="zulip")
+        # Messages sent in quick succession by one person in one conversation are answered as one turn
+        self.coalescer = Coalescer(
+            self.dispatch,
+            window_ms=kwargs.get('coalesce_window_ms', 0),
+            max_wait_ms=kwargs.get('coalesce_max_wait_ms', 5000),
+        )
+        self.state_file = os.path.expandvars(kwargs.get(
+            'state_file',
+            "{}/zulip-{}.json".format(DEFAULTS['STATE_LIBRARY'], kwargs['email']),
+        ))
+        self.seen_ids = deque(maxlen=kwargs.get('dedup_window', 1024))
+        # Most messages fetched to catch up on after the event queue expired
+        self.max_backfill = kwargs.get('max_backfill', 100)
+
+        # Built once rather than per message
+        self.callbacks = {
+            'start': self.start_callback,
+            'finish': self.finish_callback,
+            'write': self.write_callback,
+            'cutoff': self.cutoff_callback,
+            'quota': self.quota_callback,
+            'cancelled': self.cancelled_callback,
+            'tool': lambda m, i: None,
+            'success': lambda m: None,
+            'failure': lambda m: None,
+            'warning': lambda m: None,
+            'info': lambda m: None,
+            'intervention': lambda m: None,
+        }
     
     def convert_think_blocks_to_spoilers(self, text):
         """Convert <think></think> blocks to Zulip spoilers."""
@@ -32,12 +85,195 @@ class ZulipInterface(MessagingInterface):
             content = match.group(1).strip()
             return f"```spoiler Thinking\n{content}\n```"
         
-        # Use re.DOTALL to match across newlines, re.IGNORECASE for case insensitivity
-        pattern = r'<think>(.*?)</think>'
-        return re.sub(pattern, replace_think_block, text, flags=re.DOTALL | re.IGNORECASE)
+        return THINK_BLOCK.sub(replace_think_block, text)
     
     def serve(self, **kwargs):
-        self.client.call_on_each_message(self.handle_message)
+        if self.event_queue:
+            return self.serve_event_queue(**kwargs)
+        self.client.call_on_each_event(self.handle_event, event_types=self.event_types)
+
+    def conversation_key(self, message):
+        """Sender and conversation, so a quick follow-up can replace the message before it."""
+        if message['type'] == 'private':
+            where = tuple(sorted(r['id'] for r in message['display_recipient']))
+        else:
+            where = (message['stream_id'], message.get('subject'))
+        return (message['sender_id'], where)
+
+    def submit(self, message):
+        """Pre-process a new message, then hold it briefly in case more of the same burst follows."""
+        if self.draining:
+            return
+        # Cheap pre-processing stages first, so commands and our own messages never join a burst
+        if super().handle_message(message):
+            return
+        self.coalescer.add(self.conversation_key(message), message)
+
+    def dispatch(self, messages):
+        """Queue a turn for a worker, registering it first so it can be cancelled while it waits."""
+        message = merge(messages)
+        key = self.conversation_key(message)
+        superseded = self.supersede(key, message['id'])
+        if superseded:
+            # A quick follow-up replaces the unanswered turn rather than dropping it; answer all of it
+            message = merge([entry['message'] for entry in superseded if entry['message'] is not None] + [message])
+        # Every fragment maps to the turn, so editing or deleting any of them revises it
+        token = self.begin(message['id'], key, message, aliases=[fragment['id'] for fragment in fragments(message)])
+        future = self.workers.submit(self.work, message, token)
+        future.add_done_callback(self.report_failure)
+
+    def work(self, message, token):
+        try:
+            if not token.cancelled:
+                self.respond(message, cancel=token)
+        finally:
+            self.end(token)
+
+    def report_failure(self, future):
+        if future.exception() is not None:
+            log.error("Error handling message", exc_info=future.exception(), extra=self.scope)
+
+    def handle_event(self, event):
+        if event['type'] == 'message':
+            self.submit(event['message'])
+        elif event['type'] == 'delete_message':
+            for mid in event.get('message_ids', [event.get('message_id')]):
+                if self.coalescer.revise(mid):
+                    continue
+                entry = self.cancel_message(mid, 'deleted')
+                if entry is not None and entry['message'] is not None:
+                    # The rest of a merged burst still wants an answer
+                    remaining = [fragment for fragment in fragments(entry['message']) if fragment['id'] != mid]
+                    if remaining:
+                        self.dispatch(remaining)
+        elif event['type'] == 'update_message' and 'content' in event and not event.get('rendering_only'):
+            if not self.cancel_on_edit or self.coalescer.revise(event['message_id'], event['content']):
+                return
+            entry = self.cancel_message(event['message_id'], 'edited')
+            if entry is not None and entry['message'] is not None:
+                # Answer the edited message instead; untouched replies that already went out stay as they are
+                self.dispatch([
+                    {**fragment, 'content': event['content']} if fragment['id'] == event['message_id'] else fragment
+                    for fragment in fragments(entry['message'])
+                ])
+
+    def stats(self):
+        return {**super().stats(), 'coalescing': self.coalescer.report()}
+
+    def load_queue_state(self):
+        """Load the persisted queue position and recently handled message IDs."""
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'queue_id': None, 'last_event_id': -1, 'last_message_id': None}
+
+        self.seen_ids.extend(state.get('seen_ids', []))
+        return {
+            'queue_id': state.get('queue_id'),
+            'last_event_id': state.get('last_event_id', -1),
+            'last_message_id': state.get('last_message_id'),
+        }
+
+    def save_queue_state(self, state):
+        """Atomically persist the queue position so a restarted process can resume."""
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({**state, 'seen_ids': list(self.seen_ids)}, f)
+        os.replace(tmp, self.state_file)
+
+    def register_queue(self):
+        """Register a fresh event queue, retrying with backoff until the server accepts."""
+        delay = 1
+        while True:
+            result = self.client.register(event_types=self.event_types, narrow=[])
+            if result.get('result') == 'success':
+                return {'queue_id': result['queue_id'], 'last_event_id': result['last_event_id'], 'last_message_id': None}
+            log.warning("Failed to register event queue (%s), retrying in %ss", result.get('msg', 'unknown error'), delay, extra=self.scope)
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def handle_events(self, events, state):
+        """Handle every event returned by a single poll as one batch."""
+        for event in events:
+            state['last_event_id'] = max(state['last_event_id'], event['id'])
+            if event['type'] == 'message':
+                if event['message']['id'] in self.seen_ids:
+                    continue
+                # Record the message before handling it so redelivery after a crash is harmless
+                self.seen_ids.append(event['message']['id'])
+                state['last_message_id'] = max(state.get('last_message_id') or 0, event['message']['id'])
+                self.save_queue_state(state)
+            self.handle_event(event)
+
+        if events:
+            self.save_queue_state(state)
+
+    def backfill(self, state, since):
+        """Handle messages sent after `since` that a lost event queue never delivered, oldest first."""
+        anchor = since
+        fetched = 0
+        while fetched < self.max_backfill and not self.draining:
+            try:
+                result = self.client.get_messages({
+                    'anchor': anchor,
+                    'num_before': 0,
+                    'num_after': min(self.max_backfill - fetched, 100),
+                    'narrow': [],
+                    'apply_markdown': False,
+                })
+            except Exception as e:
+                result = {'result': 'error', 'msg': str(e)}
+            if result.get('result') != 'success':
+                log.warning("Failed to fetch messages missed while the event queue was gone (%s)", result.get('msg', 'unknown error'), extra=self.scope)
+                return
+
+            # The anchor itself comes back too; deduplication skips it and anything the new queue also delivers
+            messages = [message for message in result.get('messages', []) if message['id'] > anchor]
+            if not messages:
+                return
+            for message in messages:
+                self.handle_events([{'type': 'message', 'id': state['last_event_id'], 'message': message}], state)
+            fetched += len(messages)
+            anchor = messages[-1]['id']
+            if result.get('found_newest', False):
+                return
+        if fetched >= self.max_backfill:
+            log.warning("Caught up on only the first %d messages missed while the event queue was gone", fetched, extra=self.scope)
+
+    def serve_event_queue(self, **kwargs):
+        """Long-poll `get_events` directly, resuming from persisted queue state when possible."""
+        state = self.load_queue_state()
+        delay = 1
+
+        while not self.draining:
+            if not state['queue_id']:
+                since = state.get('last_message_id')
+                state = self.register_queue()
+                self.save_queue_state(state)
+                if since is not None:
+                    # Registered first, so nothing falls between what's fetched and what the queue delivers
+                    state['last_message_id'] = since
+                    self.backfill(state, since)
+
+            try:
+                result = self.client.get_events(queue_id=state['queue_id'], last_event_id=state['last_event_id'])
+            except Exception as e:
+                result = {'result': 'error', 'msg': str(e)}
+
+            if result.get('result') != 'success':
+                if result.get('code') == 'BAD_EVENT_QUEUE_ID':
+                    # Queue expired server-side; messages sent meanwhile are fetched once the new one is registered
+                    state['queue_id'] = None
+                else:
+                    log.warning("Error polling events (%s), retrying in %ss", result.get('msg', 'unknown error'), delay, extra=self.scope)
+                    time.sleep(delay)
+                    delay = min(delay * 2, 60)
+                continue
+
+            delay = 1
+            self.handle_events(result.get('events', []), state)
 
     def start_callback(self, message, **kwargs):
         self.add_reaction(message['id'], 'look')
@@ -46,20 +282,27 @@ class ZulipInterface(MessagingInterface):
         self.remove_reaction(message['id'], 'look')
         self.remove_reaction(message['id'], 'write')
 
+    def cancelled_callback(self, message, reason, **kwargs):
+        self.finish_callback(message)
+
     def write_callback(self, message, **kwargs):
         self.add_reaction(message['id'], 'write')
 
     def cutoff_callback(self, message, **kwargs):
-        if message['type'] == 'private':
-            recips = [r['id'] for r in message['display_recipient']]
-            msg_type = "private"
-            msg_to = recips
+        self.reply_message(message, "Emergency cutoff activated.")
+        # This runs on a worker thread, where exiting would only end the worker; stop the process instead
+        self.stop()
+
+    def quota_callback(self, message, info, **kwargs):
+        if not info['notify']:
+            return
+        if info['action'] == 'reaction':
+            self.add_reaction(message['id'], 'quota')
         else:
-            msg_type = "stream"
-            msg_to = message['stream_id']
-        
-        self.client.send_message({"type": msg_type, "to": msg_to, "content": "Emergency cutoff activated."})
-        sys.exit()
+            self.reply_message(message, info['notice'])
+
+    def reply_message(self, message, data, **kwargs):
+        self.client.send_message({**message['destination'], "content": data})
 
     def add_reaction(self, mid, emoji, **kwargs):
         self.client.add_reaction({"message_id": mid, "emoji_name": self.emoji[emoji]})
@@ -68,78 +311,74 @@ class ZulipInterface(MessagingInterface):
         self.client.remove_reaction({"message_id": mid, "emoji_name": self.emoji[emoji]})
 
     def get_room_info(self, message, **kwargs):
-        info = {'ri': [], 'rs': [], 'recips': []}
-        
-        for recip in message['display_recipient']:
-            info['ri'].append(int(recip['id']))
-            info['rs'].append(str(recip['id']))
-            info['recips'].append({
-                'id': recip['id'],
-                'full_name': recip['full_name'],
-                'email': recip['email'],
-            })
-        info['ri'].sort()
+        if message['type'] != 'private':
+            # Stream messages carry the stream name here, not a recipient list
+            return {
+                'ri': [], 'rs': [], 'recips': [],
+                'visibility': 'semipublic',
+                'privacy': 'semipublic',
+                'channel': message['stream_id'],
+                'to': message['stream_id'],
+            }
 
-        if message['type'] == 'private':
-            info['visibility'] = 'private'
-            info['privacy'] = 'private_group' if len(info['recips']) > 2 else 'private_direct'
-            info['channel'] = ','.join(info['rs'])
-            info['to'] = info['ri']
-        else:
-            info['visibility'] = 'semipublic'
-            info['privacy'] = 'semipublic'
-            info['channel'] = message['stream_id']
-            info['to'] = info['channel']
+        recips = message['display_recipient']
+        info = {
+            'recips': [{'id': r['id'], 'full_name': r['full_name'], 'email': r['email']} for r in recips],
+            'rs': [str(r['id']) for r in recips],
+            'ri': sorted(int(r['id']) for r in recips),
+            'visibility': 'private',
+            'privacy': 'private_group' if len(recips) > 2 else 'private_direct',
+        }
+        info['channel'] = ','.join(info['rs'])
+        info['to'] = info['ri']
 
         return info
 
-    def handle_message(self, message, **kwargs):
-        if message['sender_id'] == self.profile['user_id']:
-            return
-
-        kwargs.update(self.get_room_info(message, **kwargs))
+    def is_own_message(self, message, **kwargs):
+        return message['sender_id'] == self.profile['user_id']
 
-        # Handle special commands
+    def handle_message(self, message, **kwargs):
+        # Cheap pre-processing stages first; dropped messages never build room info
         if super().handle_message(message, **kwargs):
             return
+        self.respond(message, **kwargs)
 
-        msg = {
-            'id': message['id'],
-            'sender': {
-                'name': message['sender_full_name'],
-                'email': message['sender_email'],
-                'id': message['sender_id'],
-            },
-            'recips': kwargs['recips'],
-            'source': self.sourcename,
-            'content': message['content'],
-            'channel': kwargs['channel'],
-            'server': 'default',
-            'visibility': kwargs['visibility'],
-            'privacy': kwargs['privacy'],
-            'secure': False,
-        }
+    def respond(self, message, **kwargs):
+        cancel = kwargs.pop('cancel', None)
+        with self.processing():
+            kwargs.update(self.get_room_info(message, **kwargs))
 
-        response = self.chain.run(
-            msg,
-            callbacks={
-                'start': self.start_callback,
-                'finish': self.finish_callback,
-                'write': self.write_callback,
-                'cutoff': self.cutoff_callback,
-                'tool': lambda m, i: None,
-                'success': lambda m: None,
-                'failure': lambda m: None,
-                'warning': lambda m: None,
-                'info': lambda m: None,
-                'intervention': lambda m: None,
-            },
-            assistant_prefix=self.profile['full_name'],
-            stop=["\n[", "</s>"],
-            **self.tunables,
-        )
+            msg = {
+                'id': message['id'],
+                'sender': {
+                    'name': message['sender_full_name'],
+                    'email': message['sender_email'],
+                    'id': message['sender_id'],
+                },
+                'recips': kwargs['recips'],
+                'source': self.sourcename,
+                'content': message['content'],
+                'channel': kwargs['channel'],
+                'server': 'default',
+                'visibility': kwargs['visibility'],
+                'privacy': kwargs['privacy'],
+                'secure': False,
+                'privileged': message['sender_email'] in self.privileged_users,
+                'destination': {"type": message['type'], "to": kwargs['to']},
+            }
+
+            response = self.chain.run(
+                msg,
+                callbacks=self.callbacks,
+                cancel=cancel,
+                assistant_prefix=self.profile['full_name'],
+                stop=["\n[", "</s>"],
+                **self.tunables,
+            )
+            if response is None or (cancel is not None and cancel.cancelled):
+                return
         
-        # Convert think blocks to spoilers for Zulip
-        response = self.convert_think_blocks_to_spoilers(response)
+            # Convert think blocks to spoilers for Zulip
+            response = self.convert_think_blocks_to_spoilers(response)
         
-        self.client.send_message({"type": message['type'], "to": kwargs['to'], "content": response})
\ No newline at end of file
+            self.reply_message(msg, response)
\ No newline at end of file
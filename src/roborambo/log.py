@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import signal
+import logging
+import threading
+import multiprocessing.util
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from nothingburger.cli import bcolors
+from .context import current_message, current_chain
+from . import DEFAULTS
+
+root = logging.getLogger('roborambo')
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the bot, interface, conversation and message being handled.
+
+    Runs in the thread that logged, where the context variables are set;
+    values passed explicitly through `extra` win.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, 'context'):
+            msg = current_message.get() or {}
+            chain = current_chain.get()
+            record.context = {
+                'bot': getattr(record, 'bot', None) or getattr(chain, 'assistant_prefix', None),
+                'interface': getattr(record, 'interface', None) or msg.get('source'),
+                'conversation': getattr(record, 'conversation', None) or msg.get('channel'),
+                'message': getattr(record, 'message_id', None) or msg.get('id'),
+            }
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; only runs on the listener thread (or when the ring buffer is dumped)."""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        entry.update({key: value for key, value in getattr(record, 'context', {}).items() if value is not None})
+        if hasattr(record, 'data'):
+            entry['data'] = record.data
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """The console look the daemon always had: a bold `bot/interface:` prefix, then the message."""
+
+    def format(self, record):
+        context = getattr(record, 'context', {})
+        scope = "/".join(str(context[key]) for key in ('bot', 'interface') if context.get(key)) or record.name.rsplit('.', 1)[-1]
+        text = f"{bcolors.BOLD}{scope}:{bcolors.ENDC} "
+        if record.levelno >= logging.WARNING:
+            text += f"{record.levelname} "
+        text += record.getMessage()
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+class AsyncHandler(QueueHandler):
+    """Hands records to a listener thread, so callers never wait on formatting or output.
+
+    Records are queued as they are, not pre-formatted, and the listener is
+    restarted in forked children, which don't inherit its thread.
+    """
+
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.listener = None
+        self.pid = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        with self.start_lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.SimpleQueue()
+            self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self.listener.start()
+            self.pid = os.getpid()
+            # Forked workers leave through os._exit, skipping atexit; multiprocessing still runs its finalizers
+            multiprocessing.util.Finalize(None, self.stop, exitpriority=100)
+
+    def stop(self):
+        if self.listener is not None and self.pid == os.getpid():
+            self.listener.stop()
+            self.pid = None
+
+    def prepare(self, record):
+        # Formatting is left to the listener
+        return record
+
+    def emit(self, record):
+        if self.pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+class RingBuffer(logging.Handler):
+    """The most recent records, kept unformatted in memory until they're dumped."""
+
+    def __init__(self, size=1000):
+        super().__init__()
+        self.records = deque(maxlen=size)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, path):
+        formatter = JsonFormatter()
+        records = list(self.records)
+        with open(path, "w") as f:
+            for record in records:
+                f.write(formatter.format(record) + "\n")
+        return len(records)
+
+state = {'handler': None, 'ring': None, 'dump_dir': None}
+
+def configure(**kwargs):
+    """Set up logging for the `roborambo` loggers; safe to call again with new settings.
+
+    `level` (or `debug`) sets what reaches the console or `file`, in `format`
+    'text' or 'json'. The ring buffer keeps the last `ring_size` records at
+    `ring_level` and above, and is written out on `dump_signal` or a crash.
+    """
+    level = logging.DEBUG if kwargs.get('debug') else getattr(logging, str(kwargs.get('level', 'INFO')).upper())
+    ring_level = getattr(logging, str(kwargs.get('ring_level', 'DEBUG' if kwargs.get('debug') else 'INFO')).upper())
+
+    if state['handler'] is not None:
+        root.removeHandler(state['handler'])
+        root.removeHandler(state['ring'])
+        state['handler'].stop()
+
+    formatter = JsonFormatter() if kwargs.get('format', 'text') == 'json' else TextFormatter()
+    if kwargs.get('file'):
+        path = os.path.expandvars(kwargs['file'])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        output = logging.FileHandler(path)
+    else:
+        output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(formatter)
+    output.setLevel(level)
+
+    handler = AsyncHandler([output])
+    handler.setLevel(level)
+    ring = RingBuffer(kwargs.get('ring_size', 1000))
+    ring.setLevel(ring_level)
+    for h in (handler, ring):
+        # Context is read here, in the thread that logged
+        h.addFilter(ContextFilter())
+        root.addHandler(h)
+    # Anything below both levels is dropped at the first check, before a record is built
+    root.setLevel(min(level, ring_level))
+    root.propagate = False
+
+    state.update(handler=handler, ring=ring, dump_dir=os.path.expandvars(kwargs.get('dump_dir', DEFAULTS['STATE_LIBRARY'])))
+    install_hooks(kwargs.get('dump_signal', 'SIGUSR1'))
+    return root
+
+def dump(reason="requested"):
+    """Write the ring buffer to a JSON lines file and return its path, or None if logging isn't configured."""
+    if state['ring'] is None:
+        return None
+    os.makedirs(state['dump_dir'], exist_ok=True)
+    path = os.path.join(state['dump_dir'], f"log-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}-{reason}.jsonl")
+    count = state['ring'].dump(path)
+    print(f"{bcolors.BOLD}Logging:{bcolors.ENDC} Wrote {count} recent records to {path}", file=sys.stderr)
+    return path
+
+def crashed(exc_type, exc, tb):
+    root.critical("Unhandled %s", exc_type.__name__, exc_info=(exc_type, exc, tb))
+    dump("crash")
+
+def install_hooks(dump_signal):
+    previous_hook = sys.excepthook
+    previous_thread_hook = threading.excepthook
+
+    def excepthook(exc_type, exc, tb):
+        if not issubclass(exc_type, KeyboardInterrupt):
+            crashed(exc_type, exc, tb)
+        previous_hook(exc_type, exc, tb)
+
+    def thread_excepthook(args):
+        if args.exc_type is not SystemExit:
+            crashed(args.exc_type, args.exc_value, args.exc_traceback)
+        previous_thread_hook(args)
+
+    if not getattr(sys.excepthook, 'dumps_log', False):
+        excepthook.dumps_log = True
+        sys.excepthook = excepthook
+        thread_excepthook.dumps_log = True
+        threading.excepthook = thread_excepthook
+
+    if dump_signal and hasattr(signal, dump_signal) and threading.current_thread() is threading.main_thread():
+        signal.signal(getattr(signal, dump_signal), lambda signum, frame: dump("signal"))
+
+def shutdown():
+    if state['handler'] is not None:
+        state['handler'].stop()
+
+atexit.register(shutdown)
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+import gc
+import time
+import logging
+import inspect
+import threading
+from contextlib import contextmanager, ExitStack
+from nothingburger.model_loader import initializeModel
+
+log = logging.getLogger("roborambo.models")
+
+def resident_bytes():
+    """Resident set size of this process, or 0 where it can't be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+class ModelManager:
+    """Tracks lazily loaded models in this process, unloading idle ones and enforcing a memory budget.
+
+    Before a model of known size loads, the least recently used idle models
+    are evicted until it fits under `budget_mb` (or nothing else can go); a
+    model loading for the first time without a size hint is measured, and
+    room is made after the fact. The budget is per process: in the daemon's
+    process mode every interface worker has its own.
+    """
+
+    def __init__(self, budget_mb=0, reap_interval=30.0):
+        self.budget_mb = budget_mb
+        self.reap_interval = reap_interval
+        self.handles = []
+        self.lock = threading.Lock()
+        self.reaper_pid = None
+        self.metrics = {'loads': 0, 'unloads': 0, 'evictions': 0, 'load_seconds': 0.0}
+
+    def configure(self, budget_mb=None, reap_interval=None):
+        if budget_mb is not None:
+            self.budget_mb = budget_mb
+        if reap_interval is not None:
+            self.reap_interval = reap_interval
+
+    def register(self, handle):
+        with self.lock:
+            self.handles.append(handle)
+
+    def ensure_reaper(self):
+        """Start the idle reaper on first load, and again in forked children which don't inherit it."""
+        if self.reaper_pid == os.getpid():
+            return
+        with self.lock:
+            if self.reaper_pid == os.getpid():
+                return
+            threading.Thread(target=self.reap_loop, daemon=True).start()
+            self.reaper_pid = os.getpid()
+
+    def reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            now = time.monotonic()
+            for handle in list(self.handles):
+                if handle.idle_timeout and handle.loaded and now - handle.last_used >= handle.idle_timeout:
+                    handle.unload(reason="idle")
+
+    def loaded_mb(self):
+        return sum(handle.size_mb for handle in self.handles if handle.loaded)
+
+    def admit(self, handle, incoming_mb=0):
+        """Make room for a model about to load (`incoming_mb`) or just loaded by evicting least recently used idle ones."""
+        if not self.budget_mb:
+            return
+        while self.loaded_mb() + incoming_mb > self.budget_mb:
+            candidates = [h for h in self.handles if h is not handle and h.loaded and not h.in_use]
+            if not candidates:
+                break
+            victim = min(candidates, key=lambda h: h.last_used)
+            if victim.unload(reason="evicted"):
+                self.metrics['evictions'] += 1
+
+    def stats(self):
+        return {
+            **self.metrics,
+            'loaded_mb': self.loaded_mb(),
+            'budget_mb': self.budget_mb,
+            'models': {handle.path: {'loaded': handle.loaded, 'size_mb': handle.size_mb, 'in_use': handle.in_use} for handle in self.handles},
+        }
+
+manager = ModelManager()
+
+class LazyModel:
+    """Stands in for a model, loading it on first use and unloading it after `idle_timeout` seconds unused.
+
+    Concurrent first requests share a single load. Attribute access is passed
+    through to the loaded model, so chains use it like the model itself.
+    """
+
+    lazy = True
+
+    def __init__(self, path, idle_timeout=900.0, size_mb=None, manager=manager):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.size_hint = size_mb
+        self.size_mb = size_mb or 0
+        self.manager = manager
+        self.model = None
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+        manager.register(self)
+
+    @property
+    def loaded(self):
+        return self.model is not None
+
+    def load(self):
+        with self.lock:
+            if self.model is not None:
+                return self.model
+            measured = not self.size_hint and not self.size_mb
+            # Known size: evict first, so peak memory stays within the budget
+            self.manager.admit(self, incoming_mb=self.size_mb)
+            started = time.perf_counter()
+            before = resident_bytes()
+            self.model = initializeModel(self.path)
+            elapsed = time.perf_counter() - started
+            if measured:
+                # Measured on first load, since the model config doesn't say how big the weights are
+                self.size_mb = max(resident_bytes() - before, 0) / (1024 * 1024)
+            self.manager.metrics['loads'] += 1
+            self.manager.metrics['load_seconds'] += elapsed
+            log.info("Loaded %s in %.1fs (%.0f MB)", self.path, elapsed, self.size_mb)
+        self.manager.ensure_reaper()
+        if measured:
+            self.manager.admit(self)
+        return self.model
+
+    def unload(self, reason="idle"):
+        """Drop the model unless it's busy; returns True if it was unloaded."""
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            if self.model is None or self.in_use:
+                return False
+            model, self.model = self.model, None
+            for name in ('close', 'unload'):
+                if callable(getattr(model, name, None)):
+                    getattr(model, name)()
+                    break
+            del model
+            gc.collect()
+            self.manager.metrics['unloads'] += 1
+            log.info("Unloaded %s (%s)", self.path, reason)
+            return True
+        finally:
+            self.lock.release()
+
+    @contextmanager
+    def using(self):
+        """Hold the model loaded for the duration of a call."""
+        with self.lock:
+            self.in_use += 1
+        try:
+            yield self.load()
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.last_used = time.monotonic()
+
+    def call(self, name, *args, **kwargs):
+        """Call a model method, keeping the model loaded until the call, or the stream it returns, is finished."""
+        with ExitStack() as stack:
+            model = stack.enter_context(self.using())
+            result = getattr(model, name)(*args, **kwargs)
+            if inspect.isgenerator(result):
+                return self.streaming(result, stack.pop_all())
+            return result
+
+    def streaming(self, parts, held):
+        with held:
+            yield from parts
+
+    def generate(self, *args, **kwargs):
+        return self.call('generate', *args, **kwargs)
+
+    def count_tokens(self, *args, **kwargs):
+        return self.call('count_tokens', *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only reached for attributes the handle doesn't define itself
+        if name.startswith('__') or name in ('model', 'lock'):
+            raise AttributeError(name)
+        attr = getattr(self.load(), name)
+        if not callable(attr):
+            return attr
+        # Methods go through `call`, so the model can't be evicted mid-call
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import time
+import threading
+from collections import deque
+
+class SlidingWindow:
+    """Running token total over the last `window` seconds."""
+
+    def __init__(self, window):
+        self.window = window
+        self.events = deque()
+        self.total = 0
+
+    def expire(self, now):
+        while self.events and self.events[0][0] <= now - self.window:
+            self.total -= self.events.popleft()[1]
+
+    def add(self, tokens, now):
+        self.events.append((now, tokens))
+        self.total += tokens
+
+    def usage(self, now):
+        self.expire(now)
+        return self.total
+
+    def retry_after(self, now):
+        """Seconds until the oldest recorded usage leaves the window."""
+        return max(self.events[0][0] + self.window - now, 0) if self.events else 0
+
+class QuotaManager:
+    """Per-sender and per-channel token accounting with admission control.
+
+    Limits of 0 disable that scope. Exceeding a quota is only reported for
+    notification once per window and key, so a looping user can't make the
+    bot spam notices instead.
+    """
+
+    def __init__(self, **kwargs):
+        self.window = kwargs.get('window', 3600)
+        self.user_tokens = kwargs.get('user_tokens', 0)
+        self.channel_tokens = kwargs.get('channel_tokens', 0)
+        self.action = kwargs.get('action', 'notice')  # 'notice' or 'reaction'
+        self.notice = kwargs.get('notice', "You've hit your usage quota, please try again in {minutes} minutes.")
+        self.exact_counts = kwargs.get('exact_counts', False)
+
+        self.users = {}
+        self.channels = {}
+        self.notified = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.user_tokens or self.channel_tokens)
+
+    def count_tokens(self, text, model=None):
+        """Estimate tokens cheaply, or ask the model when exact counts are configured."""
+        if self.exact_counts and model is not None and hasattr(model, 'count_tokens'):
+            return model.count_tokens(text)
+        return len(text) // 4 + 1
+
+    def window_for(self, table, key):
+        if key not in table:
+            table[key] = SlidingWindow(self.window)
+        return table[key]
+
+    def check(self, user, channel):
+        """Return None if the request is admitted, otherwise details about the exceeded quota."""
+        now = time.monotonic()
+        with self.lock:
+            for scope, table, key, limit in (
+                ('user', self.users, user, self.user_tokens),
+                ('channel', self.channels, channel, self.channel_tokens),
+            ):
+                if not limit:
+                    continue
+                window = self.window_for(table, key)
+                if window.usage(now) < limit:
+                    continue
+
+                retry_after = window.retry_after(now)
+                notify = self.notified.get((scope, key), 0) <= now
+                if notify:
+                    self.notified[(scope, key)] = now + retry_after
+                return {
+                    'scope': scope,
+                    'retry_after': retry_after,
+                    'notify': notify,
+                    'action': self.action,
+                    'notice': self.notice.format(minutes=int(retry_after // 60) + 1, scope=scope),
+                }
+        return None
+
+    def record(self, user, channel, prompt_tokens, completion_tokens):
+        """Add usage to the sender's and channel's windows; a `user` of None charges only the channel."""
+        now = time.monotonic()
+        tokens = prompt_tokens + completion_tokens
+        with self.lock:
+            if self.user_tokens and user is not None:
+                self.window_for(self.users, user).add(tokens, now)
+            if self.channel_tokens:
+                self.window_for(self.channels, channel).add(tokens, now)
+
+    def usage(self, user, channel):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                'user': self.users[user].usage(now) if user in self.users else 0,
+                'channel': self.channels[channel].usage(now) if channel in self.channels else 0,
+            }
\ No newline at end of file
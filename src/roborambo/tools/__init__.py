@@ -2,10 +2,19 @@ from .tool import Tool
 from .inspector import InspectorTool
 from .web import WebTool
 from .test import TestTool
+from .knowledgebase import KnowledgebaseTool
+from .vectorstore import VectorstoreTool
+from .recall import RecallTool
+from .results import ResultsTool
+from .catalog import ToolCatalog, get_catalog
 
 # Available tools registry
 available_tools = {
     'inspector': InspectorTool,
     'web': WebTool,
     'test': TestTool,
+    'knowledgebase': KnowledgebaseTool,
+    'vectorstore': VectorstoreTool,
+    'recall': RecallTool,
+    'results': ResultsTool,
 }
\ No newline at end of file
@@ -0,0 +1,124 @@
+import os
+import atexit
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from ..context import current_cancel
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# One event loop per process, running in a background thread.  Tool calls arrive
+# on whatever thread the model is generating in; async methods are scheduled here
+# so any number of in-flight I/O calls share a single thread.
+state = {'pid': None, 'loop': None, 'thread': None, 'pool': None, 'session': None}
+state_lock = threading.Lock()
+thread_workers = 32
+# Keep-alive connection pool for the shared HTTP session (aiohttp.TCPConnector options)
+connector_options = {'limit': 100, 'limit_per_host': 8, 'keepalive_timeout': 30, 'ttl_dns_cache': 300}
+
+def configure(workers=None, **connector):
+    """Size the tool thread pool and HTTP connection pools; takes effect for loops started afterwards."""
+    global thread_workers
+    if workers:
+        thread_workers = workers
+    connector_options.update(connector)
+
+def get_loop():
+    """Return this process's tool event loop, starting it (again, in forked children) if needed."""
+    if state['pid'] == os.getpid():
+        return state['loop']
+    with state_lock:
+        if state['pid'] != os.getpid():
+            loop = asyncio.new_event_loop()
+            pool = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="tool")
+            loop.set_default_executor(pool)
+            thread = threading.Thread(target=loop.run_forever, name="tool-loop", daemon=True)
+            thread.start()
+            state.update(pid=os.getpid(), loop=loop, thread=thread, pool=pool, session=None)
+    return state['loop']
+
+def carry(coro):
+    """Wrap a coroutine so it sees the caller's context variables; tasks on the tool loop otherwise start from the loop's."""
+    context = contextvars.copy_context()
+    async def within():
+        for var, value in context.items():
+            var.set(value)
+        return await coro
+    return within()
+
+def run(coro, timeout=None):
+    """Run a coroutine on the tool loop from synchronous code and wait for its result."""
+    loop = get_loop()
+    if threading.current_thread() is state['thread']:
+        coro.close()
+        raise RuntimeError("Blocking on the tool loop from inside it would deadlock; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(carry(coro), loop)
+    token = current_cancel.get()
+    if token is not None:
+        # Cancelling the message cancels the task, so slow I/O doesn't hold the caller
+        token.on_cancel(future.cancel)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.CancelledError:
+        token.check()
+        raise
+
+def close():
+    """Close the shared HTTP session so pooled connections are shut down cleanly."""
+    if state['pid'] == os.getpid() and state['session'] is not None and not state['session'].closed:
+        run(state['session'].close(), timeout=5)
+
+atexit.register(close)
+
+async def on_loop(coro):
+    """Await a coroutine on the tool loop from any event loop, so shared resources stay on theirs."""
+    loop = get_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(carry(coro), loop))
+
+async def to_thread(fn, *args, **kwargs):
+    """Run a blocking callable in the tool thread pool without blocking the loop."""
+    get_loop()
+    # Carry the caller's context so the message's cancel token reaches the worker thread
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(state['pool'], partial(context.run, fn, *args, **kwargs))
+
+async def acall(method, **kwargs):
+    """Await a tool method: coroutines run on the loop directly, sync methods in the thread pool."""
+    if hasattr(method, 'acall'):
+        return await method.acall(**kwargs)
+    return await to_thread(method, **kwargs)
+
+async def session():
+    """Shared aiohttp session for tool HTTP, created on first use inside the tool loop."""
+    if aiohttp is None:
+        raise ImportError("aiohttp is required for async HTTP in tools (pip install roborambo[web])")
+    if state['session'] is None or state['session'].closed:
+        state['session'] = aiohttp.ClientSession(connector=aiohttp.TCPConnector(**connector_options))
+    return state['session']
+
+class AsyncMethod:
+    """Synchronous face of an `async def` tool method.
+
+    Calling it blocks the caller until the coroutine finishes on the tool loop;
+    `acall` awaits it from async callers without tying up a thread.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.__wrapped__ = method
+        self.__name__ = method.__name__
+        self.__config__ = method.__config__
+
+    def __call__(self, *args, **kwargs):
+        return run(self.method(*args, **kwargs))
+
+    async def acall(self, *args, **kwargs):
+        return await on_loop(self.method(*args, **kwargs))
\ No newline at end of file
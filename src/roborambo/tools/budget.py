@@ -0,0 +1,148 @@
+import re
+import json
+import math
+import uuid
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from . import aio
+from ..context import current_message
+
+TOKEN = re.compile(r"\w+")
+PARAGRAPH = re.compile(r"\n\s*\n")
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+def render(result):
+    """Text form of a tool result, as the model would see it."""
+    if isinstance(result, str):
+        return result
+    return json.dumps(result, ensure_ascii=False, default=str)
+
+def head_tail(text, max_chars, query=None):
+    """Keep the start and end of the text, where summaries and conclusions usually are."""
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return f"{text[:head]}\n[…]\n{text[-tail:]}"
+
+def relevant(text, max_chars, query=None):
+    """Keep the paragraphs (or lines) sharing the most words with the call's arguments, in their original order."""
+    chunks = PARAGRAPH.split(text)
+    if len(chunks) == 1:
+        chunks = text.splitlines()
+    terms = set(TOKEN.findall((query or "").lower()))
+    if not terms:
+        return head_tail(text, max_chars)
+
+    ranked = sorted(range(len(chunks)), key=lambda i: (-len(terms & set(TOKEN.findall(chunks[i].lower()))), i))
+    keep = []
+    used = 0
+    for i in ranked:
+        if used + len(chunks[i]) > max_chars:
+            continue
+        keep.append(i)
+        used += len(chunks[i]) + 3
+    if not keep:
+        return chunks[ranked[0]][:max_chars]
+    return "\n…\n".join(chunks[i] for i in sorted(keep))
+
+def scope():
+    """The conversation a stored result belongs to, so references don't leak between conversations."""
+    message = current_message.get() or {}
+    return (message.get('source', ''), message.get('channel', ''))
+
+strategies = {
+    'head_tail': head_tail,
+    'relevance': relevant,
+}
+
+class ResultStore:
+    """Oversized tool results kept in full, so the model can page through them by reference."""
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def put(self, text, page_chars, scope=None):
+        ref = uuid.uuid4().hex[:8]
+        with self.lock:
+            self.entries[ref] = (text, page_chars, scope)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return ref
+
+    def page(self, ref, page, scope=None):
+        """Return (text of the page, number of pages), or None if the reference has expired or belongs to another scope."""
+        with self.lock:
+            entry = self.entries.get(ref)
+            if entry is None or entry[2] != scope:
+                return None
+            self.entries.move_to_end(ref)
+        text, page_chars, _ = entry
+        pages = max(math.ceil(len(text) / page_chars), 1)
+        return text[(page - 1) * page_chars:page * page_chars], pages
+
+store = ResultStore()
+
+class BudgetedMethod:
+    """Caps how many tokens a tool method's result may add to the prompt.
+
+    Results over `max_tokens` are truncated by `strategy` and stored in full;
+    the truncated text ends with the reference to page through with `results.page`.
+    Iterators are consumed only up to `store_max_tokens`, so an endless or huge
+    stream is cut off rather than materialised.
+    """
+
+    def __init__(self, name, method, max_tokens=2000, strategy='head_tail', store_max_tokens=200000):
+        self.name = name
+        self.method = method
+        self.max_tokens = max_tokens
+        self.strategy = strategies[strategy]
+        self.store_max_tokens = store_max_tokens
+        self.__wrapped__ = method
+        self.__name__ = method.__name__
+        self.__config__ = method.__config__
+        self.truncated = 0
+        self.tokens_saved = 0
+
+    def apply(self, result, kwargs):
+        cut_off = False
+        if isinstance(result, Iterator):
+            parts = []
+            size = 0
+            for part in result:
+                parts.append(render(part))
+                size += len(parts[-1])
+                if size >= self.store_max_tokens * 4:
+                    cut_off = True
+                    break
+            if hasattr(result, 'close'):
+                result.close()
+            result = "\n".join(parts)
+
+        text = render(result)
+        total = estimate_tokens(text)
+        if total <= self.max_tokens and not cut_off:
+            return result
+
+        max_chars = self.max_tokens * 4
+        query = " ".join(str(value) for value in kwargs.values() if isinstance(value, str))
+        body = self.strategy(text, max_chars, query) if total > self.max_tokens else text
+        ref = store.put(text, max_chars, scope())
+        pages = max(math.ceil(len(text) / max_chars), 1)
+
+        self.truncated += 1
+        self.tokens_saved += max(total - estimate_tokens(body), 0)
+        note = f"[Result of {self.name} truncated to about {self.max_tokens} of {total} tokens"
+        if cut_off:
+            note += " (the source produced more and was cut off)"
+        note += f". The full result is stored as `{ref}` in {pages} pages; read them with `results.page(ref_id=\"{ref}\", page=N)`.]"
+        return f"{body}\n\n{note}"
+
+    def __call__(self, **kwargs):
+        return self.apply(self.method(**kwargs), kwargs)
+
+    async def acall(self, **kwargs):
+        return self.apply(await aio.acall(self.method, **kwargs), kwargs)
\ No newline at end of file
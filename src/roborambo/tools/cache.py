@@ -0,0 +1,150 @@
+import time
+import asyncio
+import weakref
+import threading
+from inspect import signature
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import Future
+from . import aio
+from ..cancel import Cancelled, checkpoint
+
+class Abandoned(Exception):
+    """The shared call was cancelled along with the message that started it; waiters try again."""
+
+# Every live method cache, so hit rates can be reported (see `InspectorTool.cache_stats`)
+caches = weakref.WeakSet()
+
+class MethodCache:
+    """Thread-safe memoization for a single tool method.
+
+    Entries expire after `ttl` seconds (never if None) and are evicted least
+    recently used beyond `max_entries`. Concurrent calls with the same key are
+    single-flighted: one executes, the rest wait for and share its result,
+    or run it themselves if it was cancelled along with its message.
+    """
+
+    def __init__(self, name, method, ttl=None, max_entries=128, key_args=None):
+        self.name = name
+        self.method = method
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.key_args = key_args
+        self.signature = signature(method)
+        self.__wrapped__ = method
+        self.__name__ = method.__name__
+        self.__config__ = method.__config__
+
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        caches.add(self)
+
+    def key(self, args, kwargs):
+        bound = self.signature.bind_partial(*args, **kwargs).arguments
+        # Fold any **kwargs catch-all into the top level
+        for param in self.signature.parameters.values():
+            if param.kind is param.VAR_KEYWORD and param.name in bound:
+                bound = {**bound, **bound.pop(param.name)}
+        names = self.key_args if self.key_args is not None else sorted(bound)
+        return repr(tuple((name, bound.get(name)) for name in names))
+
+    def claim(self, key):
+        """Return ('hit', value), or ('lead'|'follow', future) for the call in flight under `key`."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return 'hit', entry[1]
+
+            flight = self.inflight.get(key)
+            if flight is not None:
+                self.shared += 1
+                return 'follow', flight
+            flight = self.inflight[key] = Future()
+            self.misses += 1
+            return 'lead', flight
+
+    def settle(self, key, flight, value=None, error=None):
+        with self.lock:
+            # A stream can only be read once, so it's shared with waiting calls but not kept
+            if error is None and not isinstance(value, Iterator):
+                expires = time.monotonic() + self.ttl if self.ttl is not None else None
+                self.entries[key] = (expires, value)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            del self.inflight[key]
+        if error is None:
+            flight.set_result(value)
+        else:
+            flight.set_exception(error)
+
+    def __call__(self, *args, **kwargs):
+        key = self.key(args, kwargs)
+        while True:
+            state, result = self.claim(key)
+            if state == 'hit':
+                return result
+            if state == 'lead':
+                break
+            try:
+                return result.result()
+            except Abandoned:
+                checkpoint()
+
+        try:
+            value = self.method(*args, **kwargs)
+        except Cancelled:
+            # Only the leader's message was cancelled, so waiters run the call themselves
+            self.settle(key, result, error=Abandoned())
+            raise
+        except BaseException as e:
+            self.settle(key, result, error=e)
+            raise
+        self.settle(key, result, value)
+        return value
+
+    async def acall(self, **kwargs):
+        """Async counterpart of calling the cache; waits on shared calls without holding a thread."""
+        key = self.key((), kwargs)
+        while True:
+            state, result = self.claim(key)
+            if state == 'hit':
+                return result
+            if state == 'lead':
+                break
+            try:
+                return await asyncio.wrap_future(result)
+            except Abandoned:
+                checkpoint()
+
+        try:
+            value = await aio.acall(self.method, **kwargs)
+        except (Cancelled, asyncio.CancelledError):
+            self.settle(key, result, error=Abandoned())
+            raise
+        except BaseException as e:
+            self.settle(key, result, error=e)
+            raise
+        self.settle(key, result, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        calls = self.hits + self.misses + self.shared
+        return {
+            'calls': calls,
+            'hits': self.hits,
+            'shared': self.shared,
+            'misses': self.misses,
+            'entries': len(self.entries),
+            'hit_rate': (self.hits + self.shared) / calls if calls else 0.0,
+        }
\ No newline at end of file
@@ -0,0 +1,105 @@
+import threading
+from inspect import getmembers, isfunction, iscoroutinefunction, signature
+
+# Argument types as written in @method_arg, to JSON schema types
+JSON_TYPES = {
+    'str': 'string',
+    'int': 'integer',
+    'float': 'number',
+    'bool': 'boolean',
+    'list': 'array',
+    'dict': 'object',
+}
+
+def json_type(arg_type):
+    return JSON_TYPES.get(getattr(arg_type, '__name__', arg_type), 'string')
+
+def describe_method(fn):
+    config = fn.__config__
+    params = signature(fn).parameters
+    arguments = {
+        arg: {'type': getattr(conf.get('arg_type', 'str'), '__name__', conf.get('arg_type', 'str')), 'desc': conf.get('arg_desc', '')}
+        for arg, conf in config.get('arguments', {}).items()
+        if conf.get('arg_enabled', True)
+    }
+    required = [arg for arg in arguments if arg in params and params[arg].default is params[arg].empty]
+    return {
+        'description': config.get('method_desc', 'No description'),
+        'arguments': arguments,
+        'async': iscoroutinefunction(fn),
+        'parameters': {
+            'type': 'object',
+            'properties': {arg: {'type': json_type(conf['type']), 'description': conf['desc']} for arg, conf in arguments.items()},
+            'required': required,
+        },
+    }
+
+def describe_tool(slug, cls):
+    """Catalog entry for a tool class, read from its decorators without instantiating it."""
+    config = cls.__dict__.get('__config__', {})
+    methods = {
+        name: describe_method(fn)
+        for name, fn in getmembers(cls, isfunction)
+        if hasattr(fn, '__config__') and fn.__config__.get('method_enabled', True)
+    }
+    entry = {
+        'slug': slug,
+        'class': cls,
+        'name': config.get('tool_name', cls.__name__),
+        'description': config.get('tool_desc', 'No description available'),
+        'methods': methods,
+        'schemas': [
+            {'name': f"{slug}.{name}", 'description': method['description'], 'parameters': method['parameters']}
+            for name, method in methods.items()
+        ],
+    }
+
+    text = f"**{entry['name']}** (`{slug}`)\n"
+    text += f"Description: {entry['description']}\n\n"
+    text += "Available methods:\n"
+    for name, method in methods.items():
+        signature_text = ", ".join(f"{arg}: {conf['type']}" for arg, conf in method['arguments'].items())
+        text += f"  - {name}({signature_text}): {method['description']}\n"
+        for arg, conf in method['arguments'].items():
+            text += f"      - `{arg}`: {conf['desc']}\n"
+    entry['text'] = text
+    return entry
+
+class ToolCatalog:
+    """Metadata for every available tool, built once from the classes themselves.
+
+    Holds names, descriptions, methods, argument types, JSON schemas and the
+    rendered inspector text, so nothing needs a tool instance to describe it.
+    """
+
+    def __init__(self, tools=None):
+        if tools is None:
+            from . import available_tools as tools
+        self.entries = {slug: describe_tool(slug, cls) for slug, cls in tools.items()}
+
+    def __contains__(self, slug):
+        return slug in self.entries
+
+    def __getitem__(self, slug):
+        return self.entries[slug]
+
+    def slugs(self):
+        return list(self.entries)
+
+    def describe(self, slug):
+        return self.entries[slug]['text']
+
+    def schemas(self, slug):
+        return self.entries[slug]['schemas']
+
+shared = None
+shared_lock = threading.Lock()
+
+def get_catalog():
+    """The process-wide catalog of `available_tools`, built on first use."""
+    global shared
+    if shared is None:
+        with shared_lock:
+            if shared is None:
+                shared = ToolCatalog()
+    return shared
\ No newline at end of file
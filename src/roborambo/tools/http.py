@@ -0,0 +1,145 @@
+import time
+import random
+import asyncio
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from . import aio
+
+# Statuses worth another attempt; anything else is the caller's problem
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpen(Exception):
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"{endpoint} is failing, not retrying for another {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Stops calling an endpoint after `threshold` consecutive failures.
+
+    Once open, calls fail immediately for `cooldown` seconds; then a single
+    trial call is let through, closing the breaker on success or reopening it.
+    A trial that ends some other way (a bad body, cancellation) is released,
+    so the next call becomes the trial instead.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    def allow(self, endpoint):
+        """Raise `CircuitOpen` if the call may not go ahead; returns True if it is the trial call."""
+        with self.lock:
+            if self.opened_at is None:
+                return False
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0 or self.trial:
+                raise CircuitOpen(endpoint, max(remaining, 0))
+            self.trial = True
+            return True
+
+    def release(self):
+        """End a trial that neither succeeded nor failed."""
+        with self.lock:
+            self.trial = False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+# Shared across tools, so every caller of a dead host fails fast together; least recently used are dropped first
+breakers = OrderedDict()
+breakers_lock = threading.Lock()
+max_breakers = 1024
+
+def endpoint_of(url):
+    """Breakers are per host: a dead server fails every path on it, and pages don't each get their own."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+class HttpClient:
+    """Outbound HTTP for tools: pooled keep-alive connections, timeouts, jittered retries and circuit breaking.
+
+    Requests go through the shared session on the tool event loop, so
+    connections to each host are reused across calls and tools.
+    """
+
+    def __init__(self, **kwargs):
+        self.connect_timeout = kwargs.get('connect_timeout', 3.0)
+        self.read_timeout = kwargs.get('read_timeout', 15.0)
+        self.retries = kwargs.get('retries', 2)
+        self.backoff = kwargs.get('backoff', 0.25)
+        self.backoff_max = kwargs.get('backoff_max', 4.0)
+        self.failure_threshold = kwargs.get('failure_threshold', 5)
+        self.cooldown = kwargs.get('cooldown', 30.0)
+
+    def breaker(self, endpoint):
+        with breakers_lock:
+            if endpoint not in breakers:
+                breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.cooldown)
+                while len(breakers) > max_breakers:
+                    breakers.popitem(last=False)
+            breakers.move_to_end(endpoint)
+            return breakers[endpoint]
+
+    async def fetch(self, method, url, parse='text', **kwargs):
+        """Make a request and return its body, parsed as 'json', 'text' or 'bytes'.
+
+        Raises `CircuitOpen` without touching the network while the endpoint is
+        failing; connection errors, timeouts and 429/5xx responses are retried.
+        """
+        endpoint = endpoint_of(url)
+        breaker = self.breaker(endpoint)
+        timeout = aio.aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        session = await aio.session()
+
+        attempt = 0
+        while True:
+            trial = breaker.allow(endpoint)
+            try:
+                async with session.request(method, url, timeout=timeout, **kwargs) as response:
+                    if response.status in RETRY_STATUSES:
+                        raise aio.aiohttp.ClientResponseError(response.request_info, response.history, status=response.status, message=response.reason)
+                    response.raise_for_status()
+                    if parse == 'json':
+                        body = await response.json(content_type=None)
+                    elif parse == 'bytes':
+                        body = await response.read()
+                    else:
+                        body = await response.text()
+                breaker.success()
+                return body
+            except aio.aiohttp.ClientResponseError as e:
+                if e.status not in RETRY_STATUSES:
+                    # The endpoint is up, the request was wrong
+                    breaker.success()
+                    raise
+                error = e
+            except (aio.aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            except BaseException:
+                # Says nothing about the endpoint's health, but mustn't leave the trial outstanding
+                if trial:
+                    breaker.release()
+                raise
+
+            breaker.failure()
+            if attempt >= self.retries:
+                raise error
+            # Full jitter keeps concurrent callers from retrying in lockstep
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt)))
+            attempt += 1
\ No newline at end of file
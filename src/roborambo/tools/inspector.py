@@ -9,25 +9,68 @@ class InspectorTool(Tool):
     @tool_method(desc='Get more information about a given tool, including available functions and their arguments. (Hint: `inspector.inspect(tool_slug = "web")`)', enabled=True)
     @method_arg(name='tool_slug', type='str', desc='The slug used to refer to the tool that should be described.')
     def inspect(self, **kwargs):
-        from . import available_tools
-        
+        from .catalog import get_catalog
+
+        catalog = get_catalog()
         tool_slug = kwargs.get('tool_slug', 'inspector')
-        if tool_slug not in available_tools:
-            return f"Tool '{tool_slug}' not found. Available tools: {', '.join(available_tools.keys())}"
-        
-        tool_class = available_tools[tool_slug]
-        tool_instance = tool_class()
-        
-        # Basic tool information
-        tool_info = f"**{tool_class.__name__}**\n"
-        tool_info += f"Description: {getattr(tool_class, '__doc__', 'No description available')}\n\n"
-        
-        # List methods
-        tool_info += "Available methods:\n"
-        for method_name in dir(tool_instance):
-            if not method_name.startswith('_') and callable(getattr(tool_instance, method_name)):
-                method = getattr(tool_instance, method_name)
-                if hasattr(method, '__config__'):
-                    tool_info += f"  - {method_name}: {method.__config__.get('method_desc', 'No description')}\n"
-        
-        return tool_info
\ No newline at end of file
+        if tool_slug not in catalog:
+            return f"Tool '{tool_slug}' not found. Available tools: {', '.join(catalog.slugs())}"
+
+        return catalog.describe(tool_slug)
+
+    @tool_method(desc='Report result cache hit rates for tool methods that memoize their results', enabled=True)
+    @method_arg(name='tool_slug', type='str', desc='Optionally limit the report to one tool')
+    def cache_stats(self, **kwargs):
+        from .catalog import get_catalog
+        from .cache import caches
+
+        catalog = get_catalog()
+        prefix = None
+        if kwargs.get('tool_slug'):
+            if kwargs['tool_slug'] not in catalog:
+                return f"Tool '{kwargs['tool_slug']}' not found. Available tools: {', '.join(catalog.slugs())}"
+            prefix = f"{catalog[kwargs['tool_slug']]['class'].__name__}."
+
+        # Several instances of a tool may exist; report per method
+        totals = {}
+        for cache in list(caches):
+            if prefix and not cache.name.startswith(prefix):
+                continue
+            stats = cache.stats()
+            total = totals.setdefault(cache.name, {'calls': 0, 'hits': 0, 'shared': 0, 'entries': 0})
+            for field in total:
+                total[field] += stats[field]
+
+        if not totals:
+            return "No cached tool methods have been used yet"
+
+        report = "Cache hit rates:\n"
+        for name, total in sorted(totals.items()):
+            rate = (total['hits'] + total['shared']) / total['calls'] if total['calls'] else 0.0
+            report += f"  - {name}: {rate:.0%} of {total['calls']} calls ({total['shared']} shared in flight, {total['entries']} entries)\n"
+        return report
+
+    @tool_method(desc='Report how this bot has been spending its effort, e.g. prompt tokens saved by only offering relevant tools', enabled=True)
+    def usage_stats(self, **kwargs):
+        from ..context import current_chain
+        from ..model_handle import manager as model_manager
+
+        chain = current_chain.get()
+        report = ""
+        router = getattr(chain, 'router', None)
+        if router is not None:
+            stats = router.stats()
+            report += f"Tool routing: ~{stats['tokens_saved']} schema tokens left out over {stats['turns']} turns ({stats['tokens_saved_per_turn']:.0f} per turn, of {stats['schema_tokens']} for every tool)\n"
+        if hasattr(chain, 'tier_report'):
+            for tier, stats in sorted(chain.tier_report().items()):
+                report += f"Model tier {tier}: {stats['calls']} calls, {stats['mean_latency']:.2f}s mean latency\n"
+        models = model_manager.stats()
+        if models['models']:
+            budget = f" of a {models['budget_mb']} MB budget" if models['budget_mb'] else ""
+            report += (f"Lazy models: {models['loaded_mb']:.0f} MB loaded{budget}; {models['loads']} loads ({models['load_seconds']:.1f}s), "
+                       f"{models['unloads']} unloads, {models['evictions']} evictions\n")
+        if getattr(chain, 'speculate', False):
+            for channel, stats in sorted(chain.speculation_report().items(), key=lambda item: str(item[0])):
+                report += (f"Speculation in {channel}: {stats['speculated']} drafted early, {stats['hit_rate']:.0%} used, {stats['waste_rate']:.0%} wasted "
+                           f"({stats['over_budget']} over budget, {stats['needs_tools']} needed tools)\n")
+        return report or "No usage has been recorded yet"
\ No newline at end of file
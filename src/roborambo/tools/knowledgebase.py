@@ -0,0 +1,264 @@
+import os
+import re
+import html
+import json
+import math
+import mmap
+import heapq
+import hashlib
+import marshal
+from array import array
+from collections import Counter
+from .util import tool_name, tool_method, tool_class, method_arg
+from .tool import Tool
+from .. import DEFAULTS
+
+TOKEN = re.compile(r"\w+")
+HTML_NOISE = re.compile(r"(?is)<(script|style)[^>]*>.*?</\1>|<!--.*?-->")
+HTML_TAG = re.compile(r"<[^>]+>")
+HTML_TITLE = re.compile(r"(?is)<title[^>]*>(.*?)</title>")
+MD_TITLE = re.compile(r"(?m)^#\s+(.+)$")
+
+SUFFIXES = ('.md', '.markdown', '.txt', '.rst', '.html', '.htm')
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+def extract_text(path):
+    """Return (title, plain text) for a markdown, HTML or text file."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        raw = f.read()
+
+    if path.lower().endswith(('.html', '.htm')):
+        match = HTML_TITLE.search(raw)
+        title = html.unescape(match.group(1)).strip() if match else None
+        text = html.unescape(HTML_TAG.sub(" ", HTML_NOISE.sub(" ", raw)))
+    else:
+        match = MD_TITLE.search(raw)
+        title = match.group(1).strip() if match else None
+        text = raw
+
+    return title or os.path.basename(path), text
+
+def map_array(path, typecode):
+    """Memory-map a file of native-endian values as a read-only typed view."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return array(typecode)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+class InvertedIndex:
+    """BM25 inverted index stored on disk.
+
+    Layout under `index_path`:
+      - `manifest.json`: documents, term dictionary (term -> [offset, df]) and corpus stats
+      - `postings.bin`: memory-mapped uint32 (doc_id, tf) pairs, contiguous per term
+      - `lengths.bin`: memory-mapped uint32 document lengths
+      - `forward.bin`: cached per-document term counts, so re-indexing only re-reads changed files
+    """
+
+    def __init__(self, index_path, k1=1.2, b=0.75):
+        self.index_path = index_path
+        self.k1 = k1
+        self.b = b
+        self.loaded = False
+
+    def file(self, name):
+        return os.path.join(self.index_path, name)
+
+    @property
+    def exists(self):
+        return os.path.exists(self.file("manifest.json"))
+
+    def stale(self):
+        """True if the index hasn't been loaded or was rebuilt (e.g. by `rambo index`) since loading."""
+        return not self.loaded or os.stat(self.file("manifest.json")).st_mtime_ns != self.manifest_mtime
+
+    def load(self):
+        self.manifest_mtime = os.stat(self.file("manifest.json")).st_mtime_ns
+        with open(self.file("manifest.json"), "r") as f:
+            manifest = json.load(f)
+
+        self.root = manifest['root']
+        self.docs = manifest['docs']
+        self.terms = manifest['terms']
+        self.postings = map_array(self.file("postings.bin"), 'I')
+        self.lengths = map_array(self.file("lengths.bin"), 'I')
+
+        # Length normalisation only depends on the document, so precompute it once
+        avgdl = manifest['avgdl'] or 1
+        self.norms = [self.k1 * (1 - self.b + self.b * length / avgdl) for length in self.lengths]
+        self.loaded = True
+
+    def build(self, root):
+        """Index every supported file under `root`, re-reading only files that changed."""
+        forward = {}
+        if os.path.exists(self.file("forward.bin")):
+            with open(self.file("forward.bin"), "rb") as f:
+                forward = marshal.load(f)
+
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+        current = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for filename in filenames:
+                if not filename.lower().endswith(SUFFIXES):
+                    continue
+                path = os.path.relpath(os.path.join(dirpath, filename), root)
+                st = os.stat(os.path.join(root, path))
+
+                cached = forward.get(path)
+                if cached and cached['mtime'] == st.st_mtime_ns and cached['size'] == st.st_size:
+                    current[path] = cached
+                    stats['unchanged'] += 1
+                    continue
+
+                title, text = extract_text(os.path.join(root, path))
+                tf = Counter(tokenize(text))
+                current[path] = {
+                    'mtime': st.st_mtime_ns,
+                    'size': st.st_size,
+                    'title': title,
+                    'length': sum(tf.values()),
+                    'tf': dict(tf),
+                }
+                stats['updated' if cached else 'added'] += 1
+        stats['removed'] = len(set(forward) - set(current))
+        stats['documents'] = len(current)
+
+        if self.exists and not (stats['added'] or stats['updated'] or stats['removed']):
+            with open(self.file("manifest.json"), "r") as f:
+                stats['terms'] = len(json.load(f)['terms'])
+            return stats
+
+        # Postings are rebuilt from the forward cache; doc ids are positions in the sorted path list
+        paths = sorted(current)
+        inverted = {}
+        lengths = array('I')
+        for doc_id, path in enumerate(paths):
+            lengths.append(current[path]['length'])
+            for term, count in current[path]['tf'].items():
+                if term not in inverted:
+                    inverted[term] = array('I')
+                inverted[term].extend((doc_id, count))
+
+        os.makedirs(self.index_path, exist_ok=True)
+        terms = {}
+        offset = 0
+        with open(self.file("postings.bin.tmp"), "wb") as f:
+            for term, postings in inverted.items():
+                terms[term] = [offset, len(postings) // 2]
+                postings.tofile(f)
+                offset += len(postings) // 2
+        with open(self.file("lengths.bin.tmp"), "wb") as f:
+            lengths.tofile(f)
+        with open(self.file("forward.bin.tmp"), "wb") as f:
+            marshal.dump(current, f)
+        with open(self.file("manifest.json.tmp"), "w") as f:
+            json.dump({
+                'root': os.path.abspath(root),
+                'docs': [{'path': path, 'title': current[path]['title']} for path in paths],
+                'terms': terms,
+                'avgdl': (sum(lengths) / len(lengths)) if lengths else 0,
+            }, f)
+
+        # Manifest goes last so readers never see it pointing at stale postings
+        for name in ("postings.bin", "lengths.bin", "forward.bin", "manifest.json"):
+            os.replace(self.file(f"{name}.tmp"), self.file(name))
+
+        self.loaded = False
+        stats['terms'] = len(terms)
+        return stats
+
+    def search(self, query, limit=5):
+        """Return up to `limit` (doc_id, score) pairs ranked by BM25."""
+        if self.stale():
+            self.load()
+
+        n = len(self.docs)
+        scores = {}
+        for term in set(tokenize(query)):
+            if term not in self.terms:
+                continue
+            offset, df = self.terms[term]
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            postings = self.postings[offset * 2:(offset + df) * 2]
+            for i in range(0, df * 2, 2):
+                doc_id, tf = postings[i], postings[i + 1]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self.norms[doc_id])
+
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+@tool_class(name="Knowledgebase", desc="Search and read internal documentation indexed on this machine")
+class KnowledgebaseTool(Tool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.root = os.path.expandvars(kwargs.get('path', "${HOME}/knowledgebase"))
+        default_index = "{}/knowledgebase/{}".format(
+            DEFAULTS['STATE_LIBRARY'],
+            hashlib.sha1(os.path.abspath(self.root).encode()).hexdigest()[:12],
+        )
+        self.index = InvertedIndex(
+            os.path.expandvars(kwargs.get('index_path', default_index)),
+            k1=kwargs.get('k1', 1.2),
+            b=kwargs.get('b', 0.75),
+        )
+        self.max_results = kwargs.get('max_results', 5)
+
+    def reindex(self):
+        """Incrementally update the on-disk index from the knowledgebase directory."""
+        return self.index.build(self.root)
+
+    def snippet(self, path, query, width=240):
+        try:
+            _, text = extract_text(os.path.join(self.index.root, path))
+        except OSError:
+            return ""
+
+        lowered = text.lower()
+        positions = [lowered.find(term) for term in set(tokenize(query))]
+        positions = [p for p in positions if p >= 0]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        return " ".join(text[start:start + width].split())
+
+    @tool_method(desc='Search the internal knowledgebase for documents relevant to a query', enabled=True)
+    @method_arg(name='query', type='str', desc='Keywords or question to search for')
+    def search(self, query, **kwargs):
+        if not self.index.exists:
+            self.reindex()
+
+        results = []
+        for doc_id, score in self.index.search(query, limit=self.max_results):
+            doc = self.index.docs[doc_id]
+            results.append({
+                "id": doc_id,
+                "title": doc['title'],
+                "path": doc['path'],
+                "score": round(score, 3),
+                "snippet": self.snippet(doc['path'], query),
+            })
+
+        return results
+
+    @tool_method(desc='Read the full text of a knowledgebase document', enabled=True)
+    @method_arg(name='doc_id', type='int', desc='ID of the document, as returned by `knowledgebase.search`')
+    def read(self, doc_id, **kwargs):
+        if not self.index.exists:
+            self.reindex()
+        if self.index.stale():
+            self.index.load()
+
+        try:
+            doc_id = int(doc_id)
+        except (TypeError, ValueError):
+            return f"Document ID must be a number, not {doc_id!r}"
+        if not 0 <= doc_id < len(self.index.docs):
+            return f"Document {doc_id} not found"
+
+        doc = self.index.docs[doc_id]
+        try:
+            _, text = extract_text(os.path.join(self.index.root, doc['path']))
+        except OSError:
+            return f"Document {doc_id} ({doc['path']}) can no longer be read; it may have been moved or deleted"
+        return f"# {doc['title']}\n\n{text}"
\ No newline at end of file
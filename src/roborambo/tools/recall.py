@@ -0,0 +1,25 @@
+from .util import tool_name, tool_method, tool_class, method_arg
+from .tool import Tool
+from ..context import current_message, current_chain
+
+@tool_class(name="Conversation Recall", desc="Search earlier conversations in this channel that are no longer in your context")
+class RecallTool(Tool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.max_results = kwargs.get('max_results', 5)
+
+    @tool_method(desc='Search past messages in the current conversation channel', enabled=True)
+    @method_arg(name='query', type='str', desc='Keywords describing what was discussed')
+    def search(self, query, **kwargs):
+        chain = current_chain.get()
+        message = current_message.get()
+        if chain is None or getattr(chain, 'archive', None) is None:
+            return "Conversation archive is not enabled for this assistant"
+
+        # Results are scoped to the channel the request came from, so private conversations stay private
+        if message is None:
+            return "Can't tell which conversation this search is for, so nothing was searched"
+        results = chain.archive.search(query, channel=message.get('channel', ''), limit=self.max_results)
+        if not results:
+            return f"No earlier messages found matching '{query}'"
+        return results
\ No newline at end of file
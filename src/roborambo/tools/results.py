@@ -0,0 +1,23 @@
+from .util import tool_name, tool_method, tool_class, method_arg
+from .tool import Tool
+from .budget import store, scope
+
+@tool_class(name="Tool Results", desc="Read the rest of tool results that were too long to show in full")
+class ResultsTool(Tool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    # Pages are already sized to the budget, so they're never truncated again
+    @tool_method(desc='Read one page of a stored tool result', enabled=True, max_result_tokens=0)
+    @method_arg(name='ref_id', type='str', desc='Reference of the stored result, as given in the truncation note')
+    @method_arg(name='page', type='int', desc='Page number, starting at 1')
+    def page(self, ref_id, page=1, **kwargs):
+        page = int(page)
+        found = store.page(ref_id, page, scope())
+        if found is None:
+            return f"Result '{ref_id}' not found; it may have expired, so call the original tool again"
+
+        text, pages = found
+        if not 1 <= page <= pages:
+            return f"Result '{ref_id}' has {pages} pages"
+        return f"[Page {page} of {pages} of result {ref_id}]\n{text}"
\ No newline at end of file
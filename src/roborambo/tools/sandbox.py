@@ -0,0 +1,198 @@
+import os
+import time
+import queue
+import pickle
+import signal
+import threading
+import multiprocessing
+from ..cancel import Cancelled, checkpoint
+from ..context import current_message
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Workers are forked so they start with the tool already initialised (indexes loaded, sessions configured)
+if 'fork' in multiprocessing.get_all_start_methods():
+    mp = multiprocessing.get_context('fork')
+else:
+    mp = multiprocessing.get_context()
+
+class CPUTimeExceeded(Exception):
+    pass
+
+def address_space():
+    """Current virtual memory size of this process in bytes, or 0 where it can't be read."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+def worker_main(conn, methods, limits):
+    """Serve tool calls from the parent over `conn` until it goes away."""
+    from .tool import Tool
+    # The parent's executor doesn't survive the fork; run offloaded steps inline
+    Tool.process_pool = None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    busy = [False]
+    def cpu_exceeded(signum, frame):
+        if busy[0]:
+            raise CPUTimeExceeded()
+
+    cpu_time = limits.get('cpu_time')
+    memory_mb = limits.get('memory_mb')
+    if resource is not None:
+        if memory_mb:
+            # Relative to the forked image, which already includes whatever the parent had mapped
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            resource.setrlimit(resource.RLIMIT_AS, (address_space() + memory_mb * 1024 * 1024, hard))
+        if cpu_time:
+            signal.signal(signal.SIGXCPU, cpu_exceeded)
+
+    parent = os.getppid()
+    while True:
+        # Siblings may hold our pipe open, so also notice the parent dying directly
+        while not conn.poll(1.0):
+            if os.getppid() != parent:
+                return
+        try:
+            name, kwargs, message = pickle.loads(conn.recv_bytes())
+        except EOFError:
+            return
+
+        if resource is not None and cpu_time:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(usage.ru_utime + usage.ru_stime + cpu_time) + 1
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+        busy[0] = True
+        # Tools scope what they return by the message they're acting for (recall, stored results)
+        token = current_message.set(message)
+        try:
+            reply = ('ok', methods[name](**kwargs))
+        except CPUTimeExceeded:
+            reply = ('error', f"exceeded its CPU time limit of {cpu_time}s")
+        except MemoryError:
+            reply = ('error', f"exceeded its memory limit of {memory_mb} MB")
+        except Exception as e:
+            reply = ('error', f"failed: {type(e).__name__}: {e}")
+        finally:
+            busy[0] = False
+            current_message.reset(token)
+
+        try:
+            payload = pickle.dumps(reply, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            payload = pickle.dumps(('error', f"returned a result that can't be serialized: {e}"), protocol=pickle.HIGHEST_PROTOCOL)
+        conn.send_bytes(payload)
+
+class Sandbox:
+    """Warm pool of forked worker processes that run a tool's methods under resource limits.
+
+    A call that raises, runs past `wall_time`, or breaches `cpu_time` or
+    `memory_mb` comes back as an error string for the model; workers that die
+    or hang are killed and replaced, so the interface process never is.
+    """
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.workers = kwargs.get('workers', 2)
+        self.wall_time = kwargs.get('wall_time', 30.0)
+        self.limits = {
+            'cpu_time': kwargs.get('cpu_time', 10),
+            'memory_mb': kwargs.get('memory_mb', 512),
+        }
+        self.methods = {}
+        self.pid = None
+        self.lock = threading.Lock()
+        self.stats = {'calls': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'cancelled': 0}
+
+    def wrap(self, name, method):
+        self.methods[name] = method
+        return SandboxedMethod(self, name, method)
+
+    def ensure(self):
+        """Start the workers on first use in each process; forked interfaces each get their own."""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.idle = queue.Queue()
+            for _ in range(self.workers):
+                self.idle.put(self.spawn())
+            self.pid = os.getpid()
+
+    def spawn(self):
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=worker_main, args=(child_conn, self.methods, self.limits), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def replace(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        return self.spawn()
+
+    def wait(self, conn):
+        """Wait up to the wall time for a reply, giving up early if the message is cancelled."""
+        deadline = time.monotonic() + self.wall_time
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if conn.poll(min(remaining, 0.25)):
+                return True
+            checkpoint()
+
+    def call(self, name, kwargs):
+        self.ensure()
+        worker = self.idle.get()
+        self.stats['calls'] += 1
+        try:
+            process, conn = worker
+            conn.send_bytes(pickle.dumps((name, kwargs, current_message.get()), protocol=pickle.HIGHEST_PROTOCOL))
+            if not self.wait(conn):
+                self.stats['timeouts'] += 1
+                worker = self.replace(worker)
+                status, result = 'error', f"exceeded its wall time limit of {self.wall_time}s"
+            else:
+                status, result = pickle.loads(conn.recv_bytes())
+        except Cancelled:
+            # The message was cancelled; free the worker instead of letting it finish
+            self.stats['cancelled'] += 1
+            worker = self.replace(worker)
+            raise
+        except (EOFError, OSError):
+            self.stats['crashes'] += 1
+            worker = self.replace(worker)
+            status, result = 'error', "crashed"
+        finally:
+            self.idle.put(worker)
+
+        if status == 'error':
+            self.stats['errors'] += 1
+            return f"Error: {self.name}.{name} {result}"
+        return result
+
+class SandboxedMethod:
+    """Stands in for a tool method, forwarding calls to the tool's sandbox."""
+
+    def __init__(self, sandbox, name, method):
+        self.sandbox = sandbox
+        self.name = name
+        self.__wrapped__ = method
+        self.__name__ = name
+        self.__config__ = method.__config__
+
+    def __call__(self, **kwargs):
+        return self.sandbox.call(self.name, kwargs)
\ No newline at end of file
@@ -1,13 +1,35 @@
-from inspect import getmembers, ismethod
+from inspect import getmembers, ismethod, iscoroutinefunction
 from .util import tool_class
+from .cache import MethodCache
+from .sandbox import Sandbox
+from .budget import BudgetedMethod
+from ..cancel import CancellableMethod
+from . import aio
 
 @tool_class(name="Base Tool", desc="Unconfigured base tool")
 class Tool:
     emoji = None
+    # Shared executor for CPU-heavy steps, set by the daemon when running in async mode
+    process_pool = None
 
     def __init__(self, **kwargs):
-        if not hasattr(self, '__config__'):
-            self.__config__ = {'tool_methods': {}}
+        # Per-instance copy; methods are bound to (and wrapped for) this instance
+        self.__config__ = {**getattr(self, '__config__', {}), 'tool_methods': {}}
+
+        # Opt-in: run this tool's methods in a pool of resource-limited worker processes
+        self.sandbox = None
+        if kwargs.get('sandbox', False):
+            self.sandbox = Sandbox(
+                self.__class__.__name__,
+                workers=kwargs.get('sandbox_workers', 2),
+                cpu_time=kwargs.get('cpu_time', 10),
+                wall_time=kwargs.get('wall_time', 30.0),
+                memory_mb=kwargs.get('memory_mb', 512),
+            )
+
+        # Default cap on result size; methods can set their own with `max_result_tokens`
+        self.max_result_tokens = kwargs.get('max_result_tokens')
+        self.result_strategy = kwargs.get('result_strategy', 'head_tail')
         
         # Initialize methods from decorated functions
         for name, method in getmembers(self, predicate=ismethod):
@@ -15,6 +37,7 @@ class Tool:
                 # Check if method is enabled (default to True if not specified)
                 method_enabled = method.__config__.get('method_enabled', True)
                 if method_enabled:
+                    method = self.wrap_method(name, method)
                     method_config = {
                         'arguments': {},
                         'method': method,
@@ -27,6 +50,46 @@ class Tool:
                         method_config['arguments'][arg] = method.__config__['arguments'][arg]
                     self.__config__["tool_methods"][name] = method_config
 
+    def wrap_method(self, name, method):
+        """Layer the execution policies declared on a tool method around it."""
+        config = method.__config__
+
+        if iscoroutinefunction(method):
+            method = aio.AsyncMethod(method)
+
+        if self.sandbox is not None:
+            method = self.sandbox.wrap(name, method)
+
+        if any(option in config for option in ('method_cache_ttl', 'method_cache_max_entries', 'method_cache_key')):
+            method = MethodCache(
+                f"{self.__class__.__name__}.{name}",
+                method,
+                ttl=config.get('method_cache_ttl'),
+                max_entries=config.get('method_cache_max_entries', 128),
+                key_args=config.get('method_cache_key'),
+            )
+
+        # Outside the cache, so cached results are budgeted (and stored for paging) afresh on every hit
+        max_result_tokens = config.get('method_max_result_tokens', self.max_result_tokens)
+        if max_result_tokens:
+            method = BudgetedMethod(
+                f"{self.__class__.__name__}.{name}",
+                method,
+                max_tokens=max_result_tokens,
+                strategy=config.get('method_result_strategy', self.result_strategy),
+            )
+
+        # Work for a cancelled message stops at its next tool call
+        method = CancellableMethod(method)
+
+        # Direct calls on the instance get the same behaviour as the executor's
+        setattr(self, name, method)
+        return method
+
+    async def acall(self, name, **kwargs):
+        """Await a tool method by name; async methods run on the tool loop, sync ones in its thread pool."""
+        return await aio.acall(self.methods[name]['method'], **kwargs)
+
     @property
     def methods(self):
         """Return configured methods for this tool."""
@@ -40,4 +103,10 @@ class Tool:
     @property
     def description(self):
         """Return tool description from configuration.""" 
-        return getattr(self, '__config__', {}).get('tool_desc', 'No description available')
\ No newline at end of file
+        return getattr(self, '__config__', {}).get('tool_desc', 'No description available')
+
+    def offload(self, fn, *args):
+        """Run a CPU-heavy, picklable function in the shared process pool when one is configured."""
+        if self.process_pool is None:
+            return fn(*args)
+        return self.process_pool.submit(fn, *args).result()
\ No newline at end of file
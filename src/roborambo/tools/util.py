@@ -15,7 +15,12 @@ def storeifindictlist(con, **kwargs):
 def conf_wrapper(w, **kwds):
     def wrapper(c, **kwargs):
         if '__config__' not in c.__dict__: c.__config__ = { 'tool_methods': {} }
-        getattr(c, '__config__').update(**(kwargs|kwds))
+        config = getattr(c, '__config__')
+        update = kwargs|kwds
+        # Stacked @method_arg decorators each contribute one argument; keep them all, in declaration order
+        if 'arguments' in update and 'arguments' in config:
+            update['arguments'] = update['arguments'] | config['arguments']
+        config.update(**update)
         return c
     return wrapper(w) if isinstance(w, Callable) else wrapper
 
@@ -39,6 +44,11 @@ def tool_method(*args, **kwargs):
         'method_name': {'name': str},
         'method_desc': {'desc': str},
         'method_enabled': {'enabled': bool},
+        'method_cache_ttl': {'cache_ttl': float},
+        'method_cache_max_entries': {'cache_max_entries': int},
+        'method_cache_key': {'cache_key': list},
+        'method_max_result_tokens': {'max_result_tokens': int},
+        'method_result_strategy': {'result_strategy': str},
     }, **kwargs))
 
 def method_arg(*args, **kwargs):
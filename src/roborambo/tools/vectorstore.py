@@ -0,0 +1,367 @@
+import os
+import re
+import json
+import zlib
+import hashlib
+import threading
+import importlib
+import itertools
+from contextlib import contextmanager
+from .util import tool_name, tool_method, tool_class, method_arg
+from .tool import Tool
+from .budget import scope
+from .. import DEFAULTS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+TOKEN = re.compile(r"\w+")
+
+class HashingEmbedder:
+    """Feature-hashing embedder over unigrams and bigrams; needs no model server.
+
+    crc32 is used rather than `hash()` so vectors are stable across processes.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN.findall(text.lower())
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-9)
+
+def load_embedder(spec, dim):
+    """Resolve an embedder: "hashing", or "module:attr" naming a callable (or factory) of texts -> vectors."""
+    if spec == "hashing":
+        return HashingEmbedder(dim)
+    module, attr = spec.split(":")
+    embedder = getattr(importlib.import_module(module), attr)
+    return embedder(dim) if isinstance(embedder, type) else embedder
+
+class VectorIndex:
+    """Compact vector index with an IVF structure and a brute-force fallback.
+
+    Vectors are stored row-normalised in a memory-mapped float16 or int8 matrix
+    (int8 rows carry a float32 scale). Once `train_size` vectors are stored,
+    k-means centroids partition them into inverted lists and searches only scan
+    the `nprobe` nearest lists.
+
+    Several processes may share an index (each interface runs in its own):
+    writes hold a file lock and first catch up with what the others saved.
+    """
+
+    def __init__(self, index_path, dim, **kwargs):
+        self.index_path = index_path
+        self.dim = dim
+        self.dtype = kwargs.get('dtype', 'float16')
+        self.nlist = kwargs.get('nlist', 64)
+        self.nprobe = kwargs.get('nprobe', 8)
+        self.train_size = kwargs.get('train_size', 4096)
+        self.lock = threading.Lock()
+
+        os.makedirs(index_path, exist_ok=True)
+        with self.locked():
+            self.load()
+
+    def load(self):
+        state = {}
+        if os.path.exists(self.file("state.json")):
+            with open(self.file("state.json"), "r") as f:
+                state = json.load(f)
+        self.count = state.get('count', 0)
+        self.capacity = state.get('capacity', 0)
+        self.trained_on = state.get('trained_on', 0)
+        if state and (state['dim'], state['dtype']) != (self.dim, self.dtype):
+            raise ValueError(f"Index at {self.index_path} stores dim={state['dim']} {state['dtype']} vectors")
+
+        self.meta = []
+        if os.path.exists(self.file("meta.jsonl")):
+            with open(self.file("meta.jsonl"), "r") as f:
+                self.meta = [json.loads(line) for line in f]
+            if len(self.meta) > self.count:
+                # Drop records from an insert that never reached state.json
+                self.meta = self.meta[:self.count]
+                with open(self.file("meta.jsonl"), "w") as f:
+                    f.writelines(json.dumps(meta) + "\n" for meta in self.meta)
+        # Where the last saved record ends; anything after it is from an insert that never finished
+        self.meta_bytes = os.path.getsize(self.file("meta.jsonl")) if self.meta else 0
+
+        self.remap()
+
+        self.centroids = None
+        self.lists = None
+        if os.path.exists(self.file("ivf.npz")):
+            ivf = np.load(self.file("ivf.npz"))
+            self.centroids = ivf['centroids']
+            self.assign(ivf['assignments'][:self.count])
+
+    def file(self, name):
+        return os.path.join(self.index_path, name)
+
+    @contextmanager
+    def locked(self, shared=False):
+        """Hold the index's file lock, so processes sharing it don't write the same rows."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.file("lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def refresh(self):
+        """Catch up with vectors other processes saved since this one last looked; needs the file lock."""
+        try:
+            with open(self.file("state.json"), "r") as f:
+                state = json.load(f)
+        except OSError:
+            return
+        if (state['count'], state['capacity'], state['trained_on']) == (self.count, self.capacity, self.trained_on):
+            return
+
+        if state['count'] > self.count:
+            with open(self.file("meta.jsonl"), "r") as f:
+                self.meta = [json.loads(line) for line in itertools.islice(f, state['count'])]
+        self.count = state['count']
+        self.meta_bytes = state.get('meta_bytes', os.path.getsize(self.file("meta.jsonl")))
+        self.trained_on = state['trained_on']
+        if state['capacity'] != self.capacity:
+            self.capacity = state['capacity']
+            self.remap()
+        if os.path.exists(self.file("ivf.npz")):
+            ivf = np.load(self.file("ivf.npz"))
+            self.centroids = ivf['centroids']
+            self.assign(ivf['assignments'][:self.count])
+
+    def storage(self):
+        """(name, columns, dtype) of each memory-mapped file."""
+        files = [("vectors", self.dim, np.float16 if self.dtype == 'float16' else np.int8)]
+        if self.dtype == 'int8':
+            files.append(("scales", None, np.float32))
+        return files
+
+    def remap(self):
+        self.vectors = None
+        self.scales = None
+        if not self.capacity:
+            return
+        for name, cols, dtype in self.storage():
+            shape = (self.capacity, cols) if cols else (self.capacity,)
+            setattr(self, name, np.memmap(self.file(name), dtype=dtype, mode='r+', shape=shape))
+
+    def grow(self, needed):
+        """Double the memory-mapped capacity until `needed` rows fit."""
+        capacity = max(self.capacity, 1024)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == self.capacity:
+            return
+
+        for name, cols, dtype in self.storage():
+            with open(self.file(name), "ab") as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize * (cols or 1))
+        self.capacity = capacity
+        self.remap()
+
+    def encode(self, vectors):
+        if self.dtype == 'float16':
+            return vectors.astype(np.float16), None
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-9) / 127.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def rows(self, ids):
+        """Decode stored rows back to float32."""
+        rows = self.vectors[ids].astype(np.float32)
+        if self.scales is not None:
+            rows *= self.scales[ids][:, None]
+        return rows
+
+    def assign(self, assignments):
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        order = np.argsort(self.assignments, kind='stable')
+        bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def train(self, iterations=10):
+        """Fit IVF centroids with k-means over (a sample of) the stored vectors."""
+        rng = np.random.default_rng(0)
+        sample = rng.choice(self.count, size=min(self.count, self.nlist * 256), replace=False)
+        data = self.rows(np.sort(sample))
+        centroids = data[rng.choice(len(data), size=min(self.nlist, len(data)), replace=False)]
+        for _ in range(iterations):
+            nearest = np.argmax(data @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = data[nearest == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_on = self.count
+        assignments = np.concatenate([
+            np.argmax(self.rows(np.arange(start, min(start + 8192, self.count))) @ self.centroids.T, axis=1)
+            for start in range(0, self.count, 8192)
+        ])
+        self.assign(assignments)
+
+    def save(self):
+        self.vectors.flush()
+        if self.scales is not None:
+            self.scales.flush()
+        if self.centroids is not None:
+            np.savez(self.file("ivf.tmp.npz"), centroids=self.centroids, assignments=self.assignments)
+            os.replace(self.file("ivf.tmp.npz"), self.file("ivf.npz"))
+        with open(self.file("state.json.tmp"), "w") as f:
+            json.dump({
+                'count': self.count,
+                'meta_bytes': self.meta_bytes,
+                'capacity': self.capacity,
+                'trained_on': self.trained_on,
+                'dim': self.dim,
+                'dtype': self.dtype,
+            }, f)
+        os.replace(self.file("state.json.tmp"), self.file("state.json"))
+
+    def add(self, vectors, metas):
+        """Insert a batch of normalised vectors with their metadata; returns the new ids."""
+        with self.lock, self.locked():
+            self.refresh()
+            start = self.count
+            end = start + len(vectors)
+            self.grow(end)
+
+            encoded, scales = self.encode(vectors)
+            self.vectors[start:end] = encoded
+            if scales is not None:
+                self.scales[start:end] = scales
+
+            with open(self.file("meta.jsonl"), "a") as f:
+                # A writer that died mid-insert may have left records past the last saved one
+                f.truncate(self.meta_bytes)
+                for meta in metas:
+                    f.write(json.dumps(meta) + "\n")
+                self.meta_bytes = f.tell()
+            self.meta.extend(metas)
+            self.count = end
+
+            if self.count >= max(self.train_size, 2 * self.trained_on):
+                # First fit, or the index has doubled since the last one
+                self.train()
+            elif self.centroids is not None:
+                self.assign(np.concatenate([self.assignments, np.argmax(vectors @ self.centroids.T, axis=1)]))
+
+            self.save()
+            return list(range(start, end))
+
+    def search(self, queries, k=5):
+        """Return, for each query vector, up to `k` (id, score) pairs by cosine similarity."""
+        # A concurrent `add` may grow and remap the vector files, or retrain the lists
+        with self.lock:
+            with self.locked(shared=True):
+                self.refresh()
+            return self.scan(queries, k)
+
+    def scan(self, queries, k):
+        if not self.count:
+            return [[] for _ in queries]
+
+        results = []
+        if self.centroids is None:
+            # Brute force, in chunks so the float32 copy stays bounded
+            scores = np.concatenate([
+                self.rows(np.arange(start, min(start + 65536, self.count))) @ queries.T
+                for start in range(0, self.count, 65536)
+            ]).T
+            for row in scores:
+                top = np.argpartition(-row, min(k, len(row) - 1))[:k]
+                top = top[np.argsort(-row[top])]
+                results.append([(int(i), float(row[i])) for i in top])
+            return results
+
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        for query, lists in zip(queries, probes):
+            candidates = np.sort(np.concatenate([self.lists[c] for c in lists]))
+            if not len(candidates):
+                results.append([])
+                continue
+            row = self.rows(candidates) @ query
+            top = np.argpartition(-row, min(k, len(row) - 1))[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([(int(candidates[i]), float(row[i])) for i in top])
+        return results
+
+@tool_class(name="Vector Store", desc="Semantic search over stored passages, with sources you can cite")
+class VectorstoreTool(Tool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if np is None:
+            raise ImportError("numpy is required for the vectorstore tool (pip install roborambo[vectorstore])")
+        dim = kwargs.get('dim', 256)
+        self.embed = load_embedder(kwargs.get('embedder', 'hashing'), dim)
+        default_index = "{}/vectorstore/{}".format(
+            DEFAULTS['STATE_LIBRARY'],
+            hashlib.sha1(kwargs.get('collection', 'default').encode()).hexdigest()[:12],
+        )
+        self.index = VectorIndex(
+            os.path.expandvars(kwargs.get('index_path', default_index)),
+            dim,
+            dtype=kwargs.get('dtype', 'float16'),
+            nlist=kwargs.get('nlist', 64),
+            nprobe=kwargs.get('nprobe', 8),
+            train_size=kwargs.get('train_size', 4096),
+        )
+        self.max_results = kwargs.get('max_results', 5)
+
+    def add_texts(self, texts, sources=None, conversation=None):
+        """Embed and store a batch of passages; with a `conversation`, only searches from it will find them."""
+        sources = sources or [None] * len(texts)
+        metas = [{'text': text, 'source': source} for text, source in zip(texts, sources)]
+        if conversation is not None:
+            for meta in metas:
+                meta['conversation'] = list(conversation)
+        return self.index.add(self.embed(texts), metas)
+
+    def search_texts(self, queries, k=None, conversation=None):
+        """Batched semantic search; returns one result list per query.
+
+        Passages stored for a conversation are left out unless it's `conversation`.
+        """
+        k = k or self.max_results
+        visible = (None, list(conversation) if conversation is not None else None)
+        # Over-fetch, since passages from other conversations are dropped afterwards
+        results = self.index.search(self.embed(queries), k * 4)
+        return [
+            [
+                {"id": i, "score": round(score, 3), "source": self.index.meta[i]['source'], "text": self.index.meta[i]['text']}
+                for i, score in hits if self.index.meta[i].get('conversation') in visible
+            ][:k]
+            for hits in results
+        ]
+
+    @tool_method(desc='Find stored passages semantically related to a query', enabled=True)
+    @method_arg(name='query', type='str', desc='What to look for')
+    def search(self, query, **kwargs):
+        return self.search_texts([query], conversation=scope())[0]
+
+    # Passages the model stores are kept to the conversation they came from, so one chat can't plant sources in another
+    @tool_method(desc='Store a passage so later searches in this conversation can find it', enabled=True)
+    @method_arg(name='text', type='str', desc='Passage to store')
+    @method_arg(name='source', type='str', desc='Where the passage came from (URL, document or person), used for citation')
+    def add(self, text, source=None, **kwargs):
+        ids = self.add_texts([text], [source], conversation=scope())
+        return f"Stored passage {ids[0]}"
\ No newline at end of file
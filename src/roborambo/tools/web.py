@@ -1,8 +1,14 @@
 import json
-import requests
 import pandoc
 from .util import tool_name, tool_method, tool_class, method_arg
 from .tool import Tool
+from . import aio
+from .http import HttpClient
+
+def render_markdown(html):
+    """Convert an HTML document to markdown; module-level so it can run in a process pool."""
+    doc = pandoc.read(html, format="html")
+    return pandoc.write(doc, format="markdown")
 
 @tool_class(name="Web Engine", desc="Enables you to search and navigate the web")
 class WebTool(Tool):
@@ -11,12 +17,20 @@ class WebTool(Tool):
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self.search_endpoint = kwargs.get('search_uri', self.search_endpoint)
+        self.http = HttpClient(
+            connect_timeout=kwargs.get('connect_timeout', 3.0),
+            read_timeout=kwargs.get('read_timeout', 15.0),
+            retries=kwargs.get('retries', 2),
+            failure_threshold=kwargs.get('failure_threshold', 5),
+            cooldown=kwargs.get('cooldown', 30.0),
+        )
 
-    @tool_method(desc='Search the web', enabled=True)
+    @tool_method(desc='Search the web', enabled=True, cache_ttl=300, cache_max_entries=256, cache_key=['query'])
     @method_arg(name='query', type='str', desc='Query to pass to the web search engine')
-    def search(self, query, **kwargs):
+    async def search(self, query, **kwargs):
         data = json.dumps({"query": query})
-        response = requests.post(self.search_endpoint, headers=self.headers, data=data).json()
+        response = await self.http.fetch('POST', self.search_endpoint, parse='json', headers=self.headers, data=data)
         
         results = []
         for webpage in response["webpages"]:
@@ -27,10 +41,10 @@ class WebTool(Tool):
         
         return results
 
-    @tool_method(desc='Read the text content of a webpage', enabled=True)
+    @tool_method(desc='Read the text content of a webpage', enabled=True, cache_ttl=600, cache_max_entries=64, cache_key=['site_uri'])
     @method_arg(name='site_uri', type='str', desc='URL of the webpage that should be rendered')
-    def read(self, site_uri, **kwargs):
-        response = requests.get(site_uri, headers=self.headers)
-        doc = pandoc.read(response.text, format="html")
-        md = f'```{pandoc.write(doc, format="markdown")}```'
+    async def read(self, site_uri, **kwargs):
+        text = await self.http.fetch('GET', site_uri, headers=self.headers)
+        # Conversion is CPU-bound, keep it off the loop
+        md = f'```{await aio.to_thread(self.offload, render_markdown, text)}```'
         return md
\ No newline at end of file
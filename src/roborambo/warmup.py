@@ -0,0 +1,51 @@
+import time
+import logging
+from nothingburger.memory import ConversationalMemory
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PROMPTS = ["Hello! Reply with a short greeting."]
+DEFAULT_TOOL_PROMPT = 'Use `inspector.inspect(tool_slug = "inspector")` to find out what the inspector tool can do, then summarise it in one sentence.'
+
+def warm_up(bot, chain, bot_conf, **kwargs):
+    """Run synthetic prompts through a bot's chain so the first real message doesn't pay for backend start-up.
+
+    Generates directly rather than through `respond`, so nothing reaches the
+    bot's memory, archive or quotas. Returns (label, seconds) for each prompt.
+    """
+    conf = bot_conf.get('tunables', {}).get('warmup', {})
+    if not conf.get('enabled', True):
+        return []
+    if getattr(chain.model, 'lazy', False):
+        # Loading it now would defeat lazy loading; the first message pays instead
+        log.info("Model loads on demand, skipping warm-up", extra={'bot': bot})
+        return []
+
+    prompts = [(f"prompt {i + 1}", prompt, {}) for i, prompt in enumerate(conf.get('prompts', DEFAULT_PROMPTS))]
+    if chain.active_tools and conf.get('tool_prompt', DEFAULT_TOOL_PROMPT):
+        # Exercises the function-calling path, which compiles and caches separately
+        prompts.append(("tool call", conf.get('tool_prompt', DEFAULT_TOOL_PROMPT), {'active_tools': chain.active_tools}))
+    prompts = [(label, prompt, extra, chain) for label, prompt, extra in prompts]
+    for tier, sibling in getattr(chain, 'tiers', {}).items():
+        if sibling is not chain:
+            prompts.append((f"{tier} tier", conf.get('prompts', DEFAULT_PROMPTS)[0], {}, sibling))
+
+    timings = []
+    for label, prompt, extra, target in prompts:
+        started = time.perf_counter()
+        try:
+            target.generate(
+                prompt,
+                memory=ConversationalMemory(),
+                max_tokens=conf.get('max_tokens', 32),
+                **{**kwargs, **extra},
+            )
+        except Exception as e:
+            log.warning("Warm-up %s failed: %s", label, e, extra={'bot': bot})
+            continue
+        timings.append((label, time.perf_counter() - started))
+        log.info("Warm-up %s took %.2fs", label, timings[-1][1], extra={'bot': bot})
+
+    if timings:
+        log.info("Warm in %.2fs", sum(seconds for _, seconds in timings), extra={'bot': bot})
+    return timings
\ No newline at end of file
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the circuit breakers guarding outbound tool HTTP.
+"""
+
+import asyncio
+import unittest
+from unittest.mock import patch
+
+try:
+    from roborambo.tools import http
+except ImportError:
+    http = None
+
+@unittest.skipIf(http is None, "roborambo.tools not importable (missing dependencies)")
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for CircuitBreaker state transitions."""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch.object(http.time, 'monotonic', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = http.CircuitBreaker(threshold=2, cooldown=30.0)
+
+    def trip(self):
+        self.breaker.failure()
+        self.breaker.failure()
+
+    def test_opens_after_threshold(self):
+        """Consecutive failures up to the threshold open the breaker."""
+        self.assertFalse(self.breaker.allow("e"))
+        self.breaker.failure()
+        self.assertFalse(self.breaker.allow("e"))
+        self.breaker.failure()
+        with self.assertRaises(http.CircuitOpen):
+            self.breaker.allow("e")
+
+    def test_trial_success_closes(self):
+        """After the cooldown a single trial is let through, and success closes the breaker."""
+        self.trip()
+        self.now += 31
+        self.assertTrue(self.breaker.allow("e"))
+        with self.assertRaises(http.CircuitOpen):
+            self.breaker.allow("e")
+        self.breaker.success()
+        self.assertFalse(self.breaker.allow("e"))
+
+    def test_trial_failure_reopens(self):
+        """A failed trial reopens the breaker for another cooldown."""
+        self.trip()
+        self.now += 31
+        self.assertTrue(self.breaker.allow("e"))
+        self.breaker.failure()
+        with self.assertRaises(http.CircuitOpen) as raised:
+            self.breaker.allow("e")
+        self.assertGreater(raised.exception.retry_after, 29)
+
+    def test_released_trial_lets_next_call_try(self):
+        """A trial ending in neither outcome doesn't leave the breaker open for good."""
+        self.trip()
+        self.now += 31
+        self.assertTrue(self.breaker.allow("e"))
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow("e"))
+
+@unittest.skipIf(http is None, "roborambo.tools not importable (missing dependencies)")
+class TestHttpClient(unittest.TestCase):
+    """Test cases for HttpClient's use of the breakers."""
+
+    def setUp(self):
+        http.breakers.clear()
+
+    def test_endpoint_is_per_host(self):
+        """Pages on one host share a breaker."""
+        self.assertEqual(http.endpoint_of("https://example.com/a?b=1"), http.endpoint_of("https://example.com/c"))
+        self.assertNotEqual(http.endpoint_of("https://example.com/a"), http.endpoint_of("https://example.org/a"))
+
+    def test_breakers_are_bounded(self):
+        """The least recently used breakers are dropped."""
+        client = http.HttpClient()
+        with patch.object(http, 'max_breakers', 3):
+            for n in range(5):
+                client.breaker(f"https://host{n}")
+        self.assertEqual(list(http.breakers), ["https://host2", "https://host3", "https://host4"])
+
+    @unittest.skipIf(http is None or http.aio.aiohttp is None, "aiohttp not installed")
+    def test_unclassified_error_releases_trial(self):
+        """A body that fails to parse during the trial doesn't wedge the breaker."""
+        class Response:
+            status = 200
+            async def __aenter__(self): return self
+            async def __aexit__(self, *args): return False
+            def raise_for_status(self): pass
+            async def json(self, **kwargs): raise ValueError("not JSON")
+
+        class Session:
+            def request(self, *args, **kwargs): return Response()
+
+        async def session():
+            return Session()
+
+        client = http.HttpClient(failure_threshold=1, cooldown=0.0)
+        breaker = client.breaker(http.endpoint_of("https://example.com/"))
+        breaker.failure()
+        with patch.object(http.aio, 'session', session):
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    asyncio.run(client.fetch('GET', "https://example.com/", parse='json'))
+        self.assertFalse(breaker.trial)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
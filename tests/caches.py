@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Tests for tool method result caching.
+"""
+
+import time
+import threading
+import unittest
+from unittest.mock import patch
+
+try:
+    from roborambo.tools import cache
+    from roborambo.cancel import CancelToken, Cancelled, checkpoint
+    from roborambo.context import current_cancel
+except ImportError:
+    cache = None
+
+def method(fn):
+    fn.__config__ = {}
+    return fn
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+@unittest.skipIf(cache is None, "roborambo.tools not importable (missing dependencies)")
+class TestMethodCache(unittest.TestCase):
+    """Test cases for expiry, eviction and keying."""
+
+    def setUp(self):
+        self.calls = []
+
+        @method
+        def lookup(query, page=1, **kwargs):
+            self.calls.append((query, page))
+            return f"{query}:{page}"
+
+        self.lookup = lookup
+
+    def test_ttl(self):
+        """Entries are served until they expire, then the method runs again."""
+        cached = cache.MethodCache("lookup", self.lookup, ttl=10)
+        with patch.object(cache.time, 'monotonic', return_value=100.0):
+            self.assertEqual(cached(query="a"), "a:1")
+            self.assertEqual(cached(query="a"), "a:1")
+        with patch.object(cache.time, 'monotonic', return_value=109.0):
+            cached(query="a")
+        self.assertEqual(len(self.calls), 1)
+        with patch.object(cache.time, 'monotonic', return_value=110.0):
+            cached(query="a")
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(cached.stats()['hits'], 2)
+
+    def test_lru_eviction(self):
+        """Beyond max_entries the least recently used entry is dropped."""
+        cached = cache.MethodCache("lookup", self.lookup, max_entries=2)
+        cached(query="a")
+        cached(query="b")
+        cached(query="a")
+        cached(query="c")
+        self.assertEqual(cached.stats()['entries'], 2)
+        cached(query="a")
+        self.assertEqual(len(self.calls), 3)
+        cached(query="b")
+        self.assertEqual(self.calls[-1], ("b", 1))
+        self.assertEqual(len(self.calls), 4)
+
+    def test_key(self):
+        """Positional and keyword spellings share an entry; key_args ignores everything else."""
+        cached = cache.MethodCache("lookup", self.lookup)
+        cached("a", 2)
+        cached(query="a", page=2)
+        cached(page=2, query="a")
+        self.assertEqual(len(self.calls), 1)
+        cached(query="a", page=3)
+        self.assertEqual(len(self.calls), 2)
+
+        by_query = cache.MethodCache("lookup", self.lookup, key_args=["query"])
+        by_query(query="b", page=1, caller="x")
+        by_query(query="b", page=1, caller="y")
+        self.assertEqual(len(self.calls), 3)
+
+    def test_errors_are_not_cached(self):
+        @method
+        def flaky():
+            self.calls.append(None)
+            raise ValueError("down")
+
+        cached = cache.MethodCache("flaky", flaky)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cached()
+        self.assertEqual(len(self.calls), 2)
+
+    def test_iterators_are_not_cached(self):
+        """A stream can only be read once, so every call gets a fresh one."""
+        @method
+        def stream():
+            self.calls.append(None)
+            return iter([1, 2])
+
+        cached = cache.MethodCache("stream", stream)
+        self.assertEqual(list(cached()), [1, 2])
+        self.assertEqual(list(cached()), [1, 2])
+        self.assertEqual(len(self.calls), 2)
+
+@unittest.skipIf(cache is None, "roborambo.tools not importable (missing dependencies)")
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for calls sharing one execution."""
+
+    def test_concurrent_calls_share_one_execution(self):
+        release = threading.Event()
+        calls = []
+
+        @method
+        def slow(query):
+            calls.append(query)
+            release.wait(5)
+            return query.upper()
+
+        cached = cache.MethodCache("slow", slow)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cached(query="q"))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: cached.stats()['shared'] == 3)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, ["Q"] * 4)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cached.stats()['shared'], 3)
+
+    def test_waiters_share_the_leaders_error(self):
+        release = threading.Event()
+
+        @method
+        def failing(query):
+            release.wait(5)
+            raise ValueError(query)
+
+        cached = cache.MethodCache("failing", failing)
+        errors = []
+
+        def call():
+            try:
+                cached(query="q")
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: cached.stats()['shared'] == 2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(cached.stats()['misses'], 1)
+
+    def test_cancelled_leader_does_not_cancel_waiters(self):
+        """A waiter whose own message is live gets a result when the leader's message is cancelled."""
+        started = threading.Event()
+        calls = []
+
+        @method
+        def slow(query):
+            calls.append(query)
+            started.set()
+            for _ in range(100):
+                checkpoint()
+                time.sleep(0.01)
+            return query.upper()
+
+        cached = cache.MethodCache("slow", slow, ttl=60)
+        leader_token = CancelToken()
+        results = {}
+
+        def call(name, token):
+            current_cancel.set(token)
+            try:
+                results[name] = cached(query="q")
+            except Cancelled as e:
+                results[name] = e
+
+        leader = threading.Thread(target=call, args=("leader", leader_token))
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=call, args=("waiter", CancelToken()))
+        waiter.start()
+        time.sleep(0.05)
+        leader_token.cancel("edited")
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertIsInstance(results["leader"], Cancelled)
+        self.assertEqual(results["waiter"], "Q")
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
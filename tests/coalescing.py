@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for merging bursts of messages and superseding unfinished turns.
+"""
+
+import time
+import threading
+import unittest
+from unittest.mock import patch
+
+try:
+    from roborambo.interfaces import coalesce, zulip
+    from roborambo.interfaces.messaging import MessagingInterface
+except ImportError:
+    coalesce = None
+
+def dm(mid, content, sender=1):
+    return {
+        'id': mid, 'type': 'private', 'content': content,
+        'sender_id': sender, 'sender_full_name': 'A', 'sender_email': 'a@example.com',
+        'display_recipient': [{'id': sender, 'full_name': 'A', 'email': 'a@example.com'}, {'id': 99, 'full_name': 'Bot', 'email': 'bot@example.com'}],
+    }
+
+@unittest.skipIf(coalesce is None, "roborambo.interfaces not importable (missing dependencies)")
+class TestCoalescer(unittest.TestCase):
+    """Test cases for the Coalescer."""
+
+    def setUp(self):
+        self.flushed = []
+        self.done = threading.Event()
+
+    def flush(self, messages):
+        self.flushed.append(coalesce.merge(messages))
+        self.done.set()
+
+    def test_no_window_flushes_immediately(self):
+        """Without a window every message is its own turn."""
+        coalescer = coalesce.Coalescer(self.flush)
+        coalescer.add('k', dm(1, "a"))
+        coalescer.add('k', dm(2, "b"))
+        self.assertEqual([m['content'] for m in self.flushed], ["a", "b"])
+        self.assertEqual(coalescer.report()['calls_saved'], 0)
+
+    def test_burst_is_merged(self):
+        """Messages inside the window become one turn carrying every fragment."""
+        coalescer = coalesce.Coalescer(self.flush, window_ms=50)
+        coalescer.add('k', dm(1, "a"))
+        coalescer.add('k', dm(2, "b"))
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(len(self.flushed), 1)
+        self.assertEqual(self.flushed[0]['content'], "a\nb")
+        self.assertEqual([f['id'] for f in coalesce.fragments(self.flushed[0])], [1, 2])
+        self.assertEqual(coalescer.report()['calls_saved'], 1)
+
+    def test_max_wait_caps_a_burst(self):
+        """A burst that keeps going is flushed once it reaches the maximum wait."""
+        coalescer = coalesce.Coalescer(self.flush, window_ms=1000, max_wait_ms=0)
+        coalescer.add('k', dm(1, "a"))
+        self.assertEqual([m['content'] for m in self.flushed], ["a"])
+
+    def test_revise_pending(self):
+        """Edits and deletions of a waiting message change the burst instead of its answer."""
+        coalescer = coalesce.Coalescer(self.flush, window_ms=50)
+        coalescer.add('k', dm(1, "a"))
+        coalescer.add('k', dm(2, "b"))
+        self.assertTrue(coalescer.revise(1, "A"))
+        self.assertTrue(coalescer.revise(2))
+        self.assertFalse(coalescer.revise(3))
+        self.assertTrue(self.done.wait(2))
+        self.assertEqual(self.flushed[0]['content'], "A")
+
+@unittest.skipIf(coalesce is None, "roborambo.interfaces not importable (missing dependencies)")
+class TestSupersede(unittest.TestCase):
+    """Test cases for cancelling a turn that a quick follow-up replaces."""
+
+    def test_same_conversation_within_window(self):
+        interface = MessagingInterface(None, supersede_window=10.0)
+        first = interface.begin(1, 'k', dm(1, "a"))
+        other = interface.begin(2, 'other', dm(2, "b"))
+        superseded = interface.supersede('k', 3)
+        self.assertEqual([entry['message']['id'] for entry in superseded], [1])
+        self.assertTrue(first.cancelled)
+        self.assertFalse(other.cancelled)
+
+    def test_disabled(self):
+        interface = MessagingInterface(None, supersede_window=0)
+        first = interface.begin(1, 'k', dm(1, "a"))
+        self.assertEqual(interface.supersede('k', 2), [])
+        self.assertFalse(first.cancelled)
+
+    def test_follow_up_answers_both(self):
+        """With default settings a quick second message is answered together with the first, not instead of it."""
+        class Client:
+            def __init__(self, **kwargs): self.sent = []
+            def get_profile(self): return {'user_id': 99, 'full_name': 'Bot'}
+            def send_message(self, message): self.sent.append(message['content'])
+            def add_reaction(self, reaction): pass
+            def remove_reaction(self, reaction): pass
+
+        release = threading.Event()
+        answered = []
+        class Chain:
+            assistant_prefix = 'Bot'
+            def run(self, message, callbacks, cancel=None, **kwargs):
+                release.wait(2)
+                if cancel is not None and cancel.cancelled:
+                    return None
+                answered.append(message['content'])
+                return "ok"
+
+        with patch.object(zulip, 'ZulipClient', Client):
+            interface = zulip.ZulipInterface(Chain(), key='k', email='bot@example.com', site='example.com', tunables={})
+        interface.handle_event({'type': 'message', 'message': dm(1, "first")})
+        time.sleep(0.05)
+        interface.handle_event({'type': 'message', 'message': dm(2, "second")})
+        release.set()
+        interface.workers.shutdown(wait=True)
+
+        self.assertEqual(answered, ["first\nsecond"])
+        self.assertEqual(dict(interface.cancellations), {'superseded': 1})
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for the knowledgebase tool's BM25 index.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    from roborambo.tools import knowledgebase
+except ImportError:
+    knowledgebase = None
+
+@unittest.skipIf(knowledgebase is None, "roborambo.tools not importable (missing dependencies)")
+class TestInvertedIndex(unittest.TestCase):
+    """Test cases for InvertedIndex building and ranking."""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.index = knowledgebase.InvertedIndex(os.path.join(self.root, ".index"))
+
+    def write(self, path, text, mtime=None):
+        with open(os.path.join(self.root, path), "w") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(os.path.join(self.root, path), ns=(mtime, mtime))
+
+    def ranked(self, query):
+        return [self.index.docs[doc_id]['path'] for doc_id, _ in self.index.search(query, limit=10)]
+
+    def test_ranking(self):
+        self.write("deploy.md", "# Deploying\nDeploy the service with the deploy script, then check the deploy log.")
+        self.write("mention.md", "# Notes\nWe talked about the service and how to deploy it, among many other things discussed at length today.")
+        self.write("vpn.txt", "Connect to the VPN before opening the service dashboard.")
+        self.write("page.html", "<html><title>Rota</title><script>deploy()</script><body>On-call rota for the service</body></html>")
+        self.index.build(self.root)
+
+        # More occurrences in a shorter document rank higher; script contents aren't indexed
+        self.assertEqual(self.ranked("deploy"), ["deploy.md", "mention.md"])
+        # A term found in every document adds little next to a rare one
+        self.assertEqual(self.ranked("service vpn")[0], "vpn.txt")
+        self.assertEqual(self.ranked("unrelated"), [])
+        self.assertEqual(self.ranked("rota"), ["page.html"])
+        self.assertEqual(self.index.docs[self.index.search("rota")[0][0]]['title'], "Rota")
+
+    def test_incremental_rebuild(self):
+        self.write("a.md", "alpha", mtime=10**18)
+        self.write("b.md", "bravo", mtime=10**18)
+        self.write("ignored.py", "charlie")
+        stats = self.index.build(self.root)
+        self.assertEqual((stats['added'], stats['documents']), (2, 2))
+
+        stats = self.index.build(self.root)
+        self.assertEqual((stats['added'], stats['updated'], stats['removed'], stats['unchanged']), (0, 0, 0, 2))
+
+        self.write("a.md", "alpha delta", mtime=2 * 10**18)
+        os.remove(os.path.join(self.root, "b.md"))
+        self.write("c.md", "charlie")
+        stats = self.index.build(self.root)
+        self.assertEqual((stats['added'], stats['updated'], stats['removed'], stats['unchanged']), (1, 1, 1, 0))
+        self.assertEqual(stats['documents'], 2)
+
+        # Searching after a rebuild serves the new postings
+        self.assertEqual(self.ranked("delta"), ["a.md"])
+        self.assertEqual(self.ranked("bravo"), [])
+        self.write("b.md", "bravo")
+        self.index.build(self.root)
+        self.assertEqual(self.ranked("bravo"), ["b.md"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for sliding-window token quotas.
+"""
+
+import unittest
+from unittest.mock import patch
+
+try:
+    from roborambo import quota
+except ImportError:
+    quota = None
+
+@unittest.skipIf(quota is None, "roborambo not importable (missing dependencies)")
+class TestSlidingWindow(unittest.TestCase):
+    """Test cases for SlidingWindow."""
+
+    def test_usage_expires(self):
+        window = quota.SlidingWindow(60)
+        window.add(10, now=0)
+        window.add(5, now=30)
+        self.assertEqual(window.usage(59), 15)
+        self.assertEqual(window.usage(60), 5)
+        self.assertEqual(window.usage(90), 0)
+
+    def test_retry_after(self):
+        """Waiting is measured from the oldest usage still in the window."""
+        window = quota.SlidingWindow(60)
+        self.assertEqual(window.retry_after(0), 0)
+        window.add(10, now=10)
+        window.add(10, now=40)
+        self.assertEqual(window.retry_after(50), 20)
+        window.usage(75)
+        self.assertEqual(window.retry_after(75), 25)
+
+@unittest.skipIf(quota is None, "roborambo not importable (missing dependencies)")
+class TestQuotaManager(unittest.TestCase):
+    """Test cases for QuotaManager admission and accounting."""
+
+    def setUp(self):
+        self.now = 1000.0
+        clock = patch.object(quota.time, 'monotonic', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_admits_until_user_limit(self):
+        manager = quota.QuotaManager(window=3600, user_tokens=100)
+        self.assertIsNone(manager.check("alice", "general"))
+        manager.record("alice", "general", 60, 40)
+        exceeded = manager.check("alice", "general")
+        self.assertEqual(exceeded['scope'], 'user')
+        self.assertEqual(exceeded['retry_after'], 3600)
+        self.assertIn("61 minutes", exceeded['notice'])
+        self.assertIsNone(manager.check("bob", "general"))
+
+    def test_window_slides(self):
+        manager = quota.QuotaManager(window=3600, user_tokens=100)
+        manager.record("alice", "general", 100, 0)
+        self.now += 1800
+        self.assertEqual(manager.check("alice", "general")['retry_after'], 1800)
+        self.now += 1800
+        self.assertIsNone(manager.check("alice", "general"))
+        self.assertEqual(manager.usage("alice", "general"), {'user': 0, 'channel': 0})
+
+    def test_notifies_once_per_window(self):
+        """A user who keeps trying is only told about the quota once until it frees up."""
+        manager = quota.QuotaManager(window=3600, user_tokens=100)
+        manager.record("alice", "general", 100, 0)
+        self.assertTrue(manager.check("alice", "general")['notify'])
+        self.now += 60
+        self.assertFalse(manager.check("alice", "general")['notify'])
+        self.now += 3540
+        manager.record("alice", "general", 100, 0)
+        self.assertTrue(manager.check("alice", "general")['notify'])
+
+    def test_channel_limit(self):
+        manager = quota.QuotaManager(window=3600, user_tokens=1000, channel_tokens=100)
+        manager.record("alice", "general", 50, 0)
+        manager.record("bob", "general", 50, 0)
+        self.assertEqual(manager.check("carol", "general")['scope'], 'channel')
+        self.assertIsNone(manager.check("carol", "random"))
+
+    def test_record_without_user_charges_channel_only(self):
+        """Usage with no sender (the group chat classifier) only counts against the channel."""
+        manager = quota.QuotaManager(window=3600, user_tokens=100, channel_tokens=1000)
+        manager.record(None, "general", 200, 0)
+        self.assertEqual(manager.usage("alice", "general"), {'user': 0, 'channel': 200})
+        self.assertNotIn(None, manager.users)
+        self.assertIsNone(manager.check("alice", "general"))
+
+    def test_disabled_scopes(self):
+        manager = quota.QuotaManager(window=3600)
+        self.assertFalse(manager.enabled)
+        manager.record("alice", "general", 10**6, 0)
+        self.assertIsNone(manager.check("alice", "general"))
+        self.assertEqual(manager.usage("alice", "general"), {'user': 0, 'channel': 0})
+
+if __name__ == '__main__':
+    unittest.main()
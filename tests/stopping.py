@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for stopping an interface that shares its process with others.
+"""
+
+import time
+import asyncio
+import threading
+import unittest
+
+try:
+    from roborambo.interfaces.messaging import MessagingInterface
+except ImportError:
+    MessagingInterface = None
+
+@unittest.skipIf(MessagingInterface is None, "roborambo.interfaces not importable (missing dependencies)")
+class TestStop(unittest.TestCase):
+    """Test cases for MessagingInterface.stop outside a supervised process."""
+
+    def test_stop_from_worker_leaves_process_running(self):
+        """An emergency cutoff on a worker thread stops only its interface."""
+        interface = MessagingInterface(None)
+        worker = threading.Thread(target=interface.stop)
+        worker.start()
+        worker.join(5)
+        self.assertTrue(interface.stopped.is_set())
+        self.assertTrue(interface.draining)
+
+    def test_stop_waits_for_in_flight_work(self):
+        """A stop while a message is being handled takes effect once it's done."""
+        interface = MessagingInterface(None)
+        with interface.processing():
+            interface.stop()
+            self.assertFalse(interface.stopped.is_set())
+        self.assertTrue(interface.stopped.is_set())
+
+    def test_aserve_returns_once_stopped(self):
+        """The interface's task ends even if its client is still blocked polling."""
+        interface = MessagingInterface(None)
+        interface.ready.set()
+        release = threading.Event()
+        interface.serve = lambda **kwargs: release.wait(5)
+        threading.Timer(0.1, interface.stop).start()
+
+        async def serve():
+            started = time.monotonic()
+            await interface.aserve()
+            elapsed = time.monotonic() - started
+            # Lets the blocked executor thread go, so the loop can shut down
+            release.set()
+            return elapsed
+
+        self.assertLess(asyncio.run(serve()), 3)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
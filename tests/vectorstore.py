@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the vectorstore tool's index.
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+
+try:
+    from roborambo.tools import vectorstore
+    from roborambo.context import current_message
+except ImportError:
+    vectorstore = None
+
+def add_batch(index, embedder, prefix):
+    for n in range(50):
+        text = f"{prefix} passage number {n}"
+        index.add(embedder([text]), [{'text': text, 'source': prefix}])
+
+@unittest.skipIf(vectorstore is None or vectorstore.np is None, "roborambo.tools or numpy not available")
+class TestVectorIndex(unittest.TestCase):
+    """Test cases for VectorIndex and VectorstoreTool."""
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.embedder = vectorstore.HashingEmbedder(64)
+
+    @unittest.skipIf(vectorstore is None or vectorstore.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(), "needs fork and fcntl")
+    def test_processes_sharing_an_index(self):
+        """Writers forked from one parent append after each other instead of over each other."""
+        index = vectorstore.VectorIndex(self.path, 64, train_size=10**6)
+        context = multiprocessing.get_context('fork')
+        writers = [context.Process(target=add_batch, args=(index, self.embedder, name)) for name in ("alpha", "beta")]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(30)
+
+        reopened = vectorstore.VectorIndex(self.path, 64, train_size=10**6)
+        self.assertEqual(reopened.count, 100)
+        with open(reopened.file("meta.jsonl")) as f:
+            self.assertEqual(len([json.loads(line) for line in f]), 100)
+        # Every row's vector still belongs to its own metadata
+        for i, meta in enumerate(reopened.meta):
+            stored = reopened.rows(vectorstore.np.array([i]))[0]
+            self.assertTrue(vectorstore.np.allclose(stored, self.embedder([meta['text']])[0], atol=1e-2), f"row {i}")
+
+        # The parent's own copy catches up before it writes
+        index.add(self.embedder(["gamma"]), [{'text': "gamma", 'source': None}])
+        self.assertEqual(index.count, 101)
+
+    def test_model_stored_passages_stay_in_their_conversation(self):
+        """Passages added through the tool are only found from the conversation that stored them."""
+        tool = vectorstore.VectorstoreTool(index_path=self.path, dim=64)
+        tool.add_texts(["shared handbook about deployments"], ["handbook"])
+        token = current_message.set({'source': 'zulip', 'channel': 'a'})
+        try:
+            tool.add(text="secret deployments plan", source="alice")
+            self.assertEqual(len(tool.search(query="deployments")), 2)
+            current_message.set({'source': 'zulip', 'channel': 'b'})
+            self.assertEqual([hit['source'] for hit in tool.search(query="deployments")], ["handbook"])
+        finally:
+            current_message.reset(token)
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file